@@ -1,30 +1,82 @@
-""" @xvdp """
+""" @xvdp
+public names are loaded lazily: submodules, and their dependencies (torch, pandas, matplotlib,
+plotly, scipy...) are only imported on first access to a name that requires them
+>>> import koreto
+>>> koreto.ObjDict   # imports koreto.utils, not torch
+"""
 import logging
+import importlib
+import importlib.util
 from .version import __version__
-WITH_TORCH = True
-try:
-    import torch
-except:
+_TORCH_WARNING = "\033[93m\033[1mpytorch not found, only numpy functions loaded...\033[0m"
+_TORCH_FOUND = importlib.util.find_spec("torch") is not None
+if not _TORCH_FOUND:
     WITH_TORCH = False
-    logging.warning("\033[93m\033[1mpytorch not found, only numpy functions loaded...\033[0m")
-
-# pylint: disable=wrong-import-position
-from .utils import DeepClone, deepclone, ObjDict, IPP, filter_kwargs
-from .memory import ObjTrace, TraceMem, GPUse, CPUse, has_cuda
-from .log import Col, PLog, sround, plotlog, contiguous
-from .scheduling import Schedule
-from .grids import  mgrid, mgrid_pos, np_mgrid, np_mgrid_pos
-from .rndm import unique_randint, randint, randitem, rndlist
-from .lut import apply_cmap
-from .fileio import get_files, get_images, hash_file, hash_folder, get_last, clip_image
-from .info import plot_esds, get_esds, get_layer_pca, pca, kde, esd
-from .info import entropy, eigen_vals, eigen_vals_low_rank, covariance, mahalanobis
-from .draw import draw_points, draw_axis, draw_vector
-from .points import zscore_keep, irq_keep, sort_points_by_distance
-from .transformations import fit_plane_normal, estimate_points_normals
-from .bounds import factorial, log_factorial
-
-if WITH_TORCH:
-    from .camera import pixels_to_rays, rotate_rays, points_to_pixels, transform_points, Camera
-    from .memory import memory_profiler
-    from .tensor_utils import extend_to, unsqueeze_to
+    logging.warning(_TORCH_WARNING)
+
+# public name: submodule
+_LAZY = {
+    **dict.fromkeys(("DeepClone", "deepclone", "ObjDict", "IPP", "filter_kwargs"), "utils"),
+    **dict.fromkeys(("ObjTrace", "TraceMem", "GPUse", "CPUse", "has_cuda"), "memory"),
+    **dict.fromkeys(("Col", "PLog", "sround", "plotlog", "contiguous"), "log"),
+    "Schedule": "scheduling",
+    **dict.fromkeys(("mgrid", "mgrid_pos", "np_mgrid", "np_mgrid_pos"), "grids"),
+    **dict.fromkeys(("unique_randint", "randint", "randitem", "rndlist"), "rndm"),
+    "apply_cmap": "lut",
+    **dict.fromkeys(("get_files", "scan_files", "iter_files", "get_images", "iter_images",
+                     "image_info", "ImageInfo", "verify_image", "verify_images", "ListingCache",
+                     "hash_file", "hash_folder", "load_hashes", "get_hasher", "find_duplicates",
+                     "HashIndex", "get_last", "clip_image"), "fileio"),
+    **dict.fromkeys(("plot_esds", "get_esds", "get_layer_pca", "pca", "kde", "esd", "entropy",
+                     "eigen_vals", "eigen_vals_low_rank", "covariance", "mahalanobis",
+                     "EntropyAccumulator", "CovarianceAccumulator", "PCAAccumulator"), "info"),
+    **dict.fromkeys(("draw_points", "draw_axis", "draw_vector"), "draw"),
+    **dict.fromkeys(("zscore_keep", "irq_keep", "sort_points_by_distance"), "points"),
+    **dict.fromkeys(("fit_plane_normal", "estimate_points_normals"), "transformations"),
+    **dict.fromkeys(("factorial", "log_factorial"), "bounds"),
+}
+_LAZY_TORCH = {
+    **dict.fromkeys(("pixels_to_rays", "rotate_rays", "points_to_pixels", "transform_points",
+                     "Camera", "UndistortMap", "RaySampler"), "camera"),
+    "memory_profiler": "memory",
+    **dict.fromkeys(("extend_to", "unsqueeze_to"), "tensor_utils"),
+}
+_TORCH_ONLY = {*_LAZY_TORCH, "camera", "tensor_utils"}
+if _TORCH_FOUND:
+    _LAZY.update(_LAZY_TORCH)
+
+__all__ = ["WITH_TORCH", "__version__", *_LAZY]
+_SUBMODULES = {*_LAZY.values()}
+
+
+def _with_torch():
+    """ WITH_TORCH: True if torch imports, only tried on first access, as torch is slow to load"""
+    if "WITH_TORCH" not in globals():
+        try:
+            import torch # pylint: disable=import-outside-toplevel, unused-import
+            globals()["WITH_TORCH"] = True
+        except Exception: # pylint: disable=broad-except
+            globals()["WITH_TORCH"] = False
+            logging.warning(_TORCH_WARNING)
+    return globals()["WITH_TORCH"]
+
+
+def __getattr__(name):
+    """ import submodule on first access to a public name or submodule, then cache it in
+    module globals"""
+    if name == "WITH_TORCH":
+        return _with_torch()
+    if name in _TORCH_ONLY and not _with_torch():
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}', torch failed to load")
+    if name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    elif name in _LAZY:
+        value = getattr(importlib.import_module(f".{_LAZY[name]}", __name__), name)
+    else:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY) | _SUBMODULES | {"WITH_TORCH"})
@@ -5,75 +5,255 @@ wip. options built to match various projects
 import numpy as np
 import torch
 from .utils import ObjDict
+from .grids import mgrid
+from .rndm import unique_randint
 
 # pylint: disable=no-member
 def undistorted_rays(xy, xy0, ks, ps):
-
+    """ residual and jacobian rows of distortion at xy
+    Args
+        xy, xy0     tensor (..., 2)
+        ks          tensor (..., 3) [k1, k2, k3], broadcastable to xy
+        ps          tensor (..., 2) [p1, p2], broadcastable to xy
+    """
+    k1, k2, k3 = ks[..., 0:1], ks[..., 1:2], ks[..., 2:3]
+    p1, p2 = ps[..., 0:1], ps[..., 1:2]
     rad = torch.sum(xy**2, axis=-1, keepdims=True)
-    dist = 1.0 + rad * (ks[0] + rad * (ks[1] + ks[2] * rad))
+    dist = 1.0 + rad * (k1 + rad * (k2 + k3 * rad))
 
     fxy = dist * xy + 2 * ps * torch.prod(xy, dim=-1, keepdim=True) + ps.flip(-1) * (rad + 2*xy**2) - xy0
 
     # dist'
-    dist_xy = 2.0*xy*(ks[0] + rad*(2.0*ks[1] + 3.0*ks[2]*rad))
+    dist_xy = 2.0*xy*(k1 + rad*(2.0*k2 + 3.0*k3*rad))
 
     # fx' over x and y
     _62 = torch.tensor([6,2], dtype=xy.dtype, device=xy.device)
-    fx_xy = dist_xy.mul(xy[..., 0:1]) + xy.flip(-1).mul(ps[0]*2) + xy.mul(_62*ps[1])
-    fx_xy[..., 0].add_(dist.squeeze())
+    fx_xy = dist_xy.mul(xy[..., 0:1]) + xy.flip(-1).mul(p1*2) + xy.mul(_62*p2)
+    fx_xy[..., 0].add_(dist[..., 0])
 
     # fy' over x and y
-    fy_xy = dist_xy.mul(xy[..., 1:2]) + xy.flip(-1).mul(ps[1]*2) + xy.mul(_62.flip(-1)*ps[0]) 
-    fy_xy[..., 1].add_(dist.squeeze())
+    fy_xy = dist_xy.mul(xy[..., 1:2]) + xy.flip(-1).mul(p2*2) + xy.mul(_62.flip(-1)*p1)
+    fy_xy[..., 1].add_(dist[..., 0])
 
     return fxy, fx_xy, fy_xy
 
+def _batch(param, ndim, tail=1):
+    """ view batched camera param (B, ..tail) as (B, 1, ..., ..tail) to broadcast with ndim pixels
+    unbatched params and scalars are returned unchanged
+    """
+    if not isinstance(param, torch.Tensor) or param.dim() <= tail:
+        return param
+    return param.view(param.shape[0], *[1]*(ndim - param.dim()), *param.shape[1:])
+
 def pixels_to_rays(pixels, center, focal, radial=None, tangential=None, ratio=1., skew=0, iters=10, z=1.0,
-                   rotation=None, normalize=True):
+                   rotation=None, normalize=True, undistort=None, tol=None, stats=False):
     """ image pixels to camera rays
     Args
-        pixels      tensor (h,w,2)
-        center      tensor (2)          [cx,cy] principal_point
-        focal       float | tensor(2)   [fx,fy] focal_
-        radial      tensor  [k1,k2,k3]  # if None: dont undistort
-        tangential  tensor  [p1,p2]     # it None: dont undistort
+        pixels      tensor (h,w,2) | (N,2) | batched (B,...,2)
+        center      tensor (2)          [cx,cy] principal_point, batched (B,2)
+        focal       float | tensor(2)   [fx,fy] focal_, batched (B,2)
+        radial      tensor  [k1,k2,k3]  # if None: dont undistort, batched (B,3)
+        tangential  tensor  [p1,p2]     # it None: dont undistort, batched (B,2)
     optional Args
         ratio       float [1.] pixel aspect ratio
         z           float [1.]: if -1 flip coordinates z and y
-        iters       int [10] ray optimization iterations
-        rotation    torch.tensor (3,3) [None], camera extrinsics
+        iters       int [10] max ray optimization iterations
+        tol         float [None] stop iterations when max residual <= tol, None: 8 eps of dtype
+        stats       bool [False] also return ObjDict(iters, residual) per pixel, see undistort()
+        rotation    torch.tensor (3,3) [None], camera extrinsics, batched (B,3,3)
         normalize   bool [True]  normalize resulting rays
+        undistort   UndistortMap [None] precomputed undistortion, replaces center, focal,
+                        radial, tangential, ratio, skew and iters; built with same z
+    batched intrinsics and extrinsics, e.g. from Camera.stack(), broadcast over the leading
+    dimension of pixels: B cameras x any pixel subset in a single call
+    >>> cams = Camera.stack(cameras)
+    >>> rays = pixels_to_rays(pixels, cams.center, cams.focal, cams.radial, cams.tangential,
+                              rotation=cams.rotation) # pixels (B,N,2) -> rays (B,N,3)
     """
     _as_tensor = {"device":pixels.device, "dtype":pixels.dtype}
-    xy = pixels.sub(center).div(focal).mul(torch.tensor([1., z/ratio], **_as_tensor))
-
-    if skew:
-        if isinstance(focal, torch.tensor) and focal.dim() == 2:
-            focal = focal[-1]
-        xy[..., 0].sub_(xy[..., 1], alpha=skew/focal)
+    ndim = pixels.dim()
+    _stats = None
+    if undistort is not None:
+        xy = undistort(pixels)
+    else:
+        xy = _pixels_to_xy(pixels, center, focal, ratio, skew, z)
+        if radial is not None and tangential is not None and (radial.any() or tangential.any()):
+            xy, _stats = _undistort(xy, _batch(radial, ndim), _batch(tangential, ndim), iters, tol)
 
-    if radial is not None and tangential is not None and (any(radial) or any(tangential)):
-        xy0 = xy.clone().detach()
-        for _ in range(iters):
-            fxy, fx_xy, fy_xy = undistorted_rays(xy, xy0, radial, tangential)
-
-            denom = (fy_xy[...,0] * fx_xy[...,1] - fx_xy[...,0] * fy_xy[...,1]).unsqueeze(-1)
-
-            step = torch.ones_like(xy)
-            step[...,0].mul_(fxy[...,0] * fy_xy[...,1] -  fxy[...,1] * fx_xy[...,1])
-            step[...,1].mul_(fxy[...,1] * fx_xy[...,0] -  fxy[...,0] * fy_xy[...,0])
-            step.div_(denom).where(denom.abs() > 1e-8, torch.zeros_like(xy))
-            xy.add_(step)
-
-    shape = list(xy.shape[:2]) + [1]
-    out = torch.cat((xy, z * torch.ones(shape, **_as_tensor)), dim=-1)
+    out = torch.cat((xy, z * torch.ones((*xy.shape[:-1], 1), **_as_tensor)), dim=-1)
 
     if rotation is not None: # extrinsics
-        out = (rotation @ out.unsqueeze(-1)).squeeze(-1)
+        out = (_batch(rotation, ndim + 1, tail=2) @ out.unsqueeze(-1)).squeeze(-1)
     if normalize:
         out = out.div(out.norm(dim=-1, keepdim=True))
+    if stats:
+        return out, _stats
     return out
 
+def _pixels_to_xy(pixels, center, focal, ratio=1., skew=0, z=1.0):
+    """ pixels to distorted normalized image plane coordinates, see pixels_to_rays()"""
+    _as_tensor = {"device":pixels.device, "dtype":pixels.dtype}
+    ndim = pixels.dim()
+    center, focal = _batch(center, ndim), _batch(focal, ndim)
+    xy = pixels.sub(center).div(focal).mul(torch.tensor([1., z/ratio], **_as_tensor))
+
+    if skew:
+        if isinstance(focal, torch.Tensor) and focal.dim() and focal.shape[-1] == 2:
+            focal = focal[..., 1:2]
+        xy[..., 0:1].sub_(xy[..., 1:2] * skew / focal)
+    return xy
+
+def _undistort(xy, radial, tangential, iters=10, tol=None):
+    """ Newton iterations inverting radial and tangential distortion, in place on xy
+    stops when max residual <= tol, work buffers are allocated once
+    Args
+        xy          tensor (...,2) distorted, overwritten with undistorted
+        radial      tensor (...,3) broadcastable to xy
+        tangential  tensor (...,2) broadcastable to xy
+        iters       int [10] max iterations
+        tol         float [None] None: 8 eps of dtype
+    Returns xy, ObjDict(iters: int tensor (...), iterations each pixel was above tol
+                        residual: tensor (...), max abs residual at returned xy)
+    """
+    tol = 8 * torch.finfo(xy.dtype).eps if tol is None else tol
+    k1, k2, k3 = radial[..., 0:1], radial[..., 1:2], radial[..., 2:3]
+    p1, p2 = tangential[..., 0:1], tangential[..., 1:2]
+    ps2 = 2 * tangential
+    psf = tangential.flip(-1)
+    k2_2, k3_3 = 2 * k2, 3 * k3
+    p1_2, p2_2, p1_6, p2_6 = 2 * p1, 2 * p2, 6 * p1, 6 * p2
+
+    xy0 = xy.clone().detach()
+    x, y = xy[..., 0:1], xy[..., 1:2]
+    fxy, sq, step = torch.empty_like(xy), torch.empty_like(xy), torch.empty_like(xy)
+    fx, fy = fxy[..., 0:1], fxy[..., 1:2]
+    rad, poly, dist, prod, jxx, jxy, jyy, det, tmp = torch.empty_like(xy[..., :1]).expand(
+        9, *xy[..., :1].shape).clone()
+    residual = torch.empty_like(xy[..., 0])
+    counts = torch.zeros(xy.shape[:-1], dtype=torch.int32, device=xy.device)
+
+    for i in range(iters + 1):
+        # residual f(xy) = distort(xy) - xy0
+        torch.mul(xy, xy, out=sq)
+        torch.sum(sq, dim=-1, keepdim=True, out=rad)
+        torch.mul(rad, k3, out=poly)
+        poly.add_(k2).mul_(rad).add_(k1)            # k1 + k2 r + k3 r^2
+        torch.mul(rad, poly, out=dist).add_(1)
+        torch.mul(x, y, out=prod)
+        torch.mul(xy, dist, out=fxy)
+        fxy.addcmul_(ps2, prod)
+        fxy.addcmul_(psf, sq.mul_(2).add_(rad)).sub_(xy0)
+
+        torch.amax(fxy.abs(), dim=-1, out=residual)
+        active = residual > tol
+        counts.add_(active)
+        if i == iters or not active.any():
+            break
+
+        # symmetric jacobian [[jxx, jxy], [jxy, jyy]], d(dist)/dxy = 2 xy (k1 + 2k2 r + 3k3 r^2)
+        torch.mul(rad, k3_3, out=tmp)
+        tmp.add_(k2_2).mul_(rad).add_(k1).mul_(2)
+        torch.mul(tmp, x, out=jxx).mul_(x).add_(dist).addcmul_(p1_2, y).addcmul_(p2_6, x)
+        torch.mul(tmp, y, out=jyy).mul_(y).add_(dist).addcmul_(p2_2, x).addcmul_(p1_6, y)
+        torch.mul(tmp, prod, out=jxy).addcmul_(p1_2, x).addcmul_(p2_2, y)
+        torch.mul(jxx, jyy, out=det).addcmul_(jxy, jxy, value=-1)
+
+        # step = -J^-1 f, zero where J is singular or iterations diverged
+        torch.mul(jyy, fx, out=step[..., 0:1]).addcmul_(jxy, fy, value=-1)
+        torch.mul(jxx, fy, out=step[..., 1:2]).addcmul_(jxy, fx, value=-1)
+        tmp.copy_(det.abs() > 1e-8)
+        step.mul_(tmp).div_(det.where(det.abs() > 1e-8, torch.ones_like(det)))
+        xy.sub_(step.nan_to_num_(0., 0., 0.))
+
+    return xy, ObjDict(iters=counts, residual=residual)
+
+class UndistortMap:
+    """ undistorted image plane coordinates precomputed on a coarse pixel grid
+    and bilinearly interpolated, replacing per call Newton iterations in pixels_to_rays()
+
+    Args
+        width, height   int | float, batched: max size is used
+        center, focal, radial, tangential, ratio, skew, iters, z, see pixels_to_rays()
+        step    (int [8]) grid node spacing in pixels, 1: full resolution
+        tol     (float [None]) if set, halve step until error <= tol or step == 1
+    Attributes
+        grid    tensor (gh, gw, 2) | batched (B, gh, gw, 2) undistorted xy at nodes
+        error   float, max abs difference to solver at cell midpoints, in image plane units,
+                multiply by focal for pixels
+
+    Examples
+    >>> umap = UndistortMap(cam.width, cam.height, cam.center, cam.focal, cam.radial,
+                            cam.tangential, tol=1e-5)
+    >>> rays = pixels_to_rays(pixels, None, None, undistort=umap)
+    >>> rays = cam.rays(pixels, undistort=True) # cached on camera
+    """
+    def __init__(self, width, height, center, focal, radial=None, tangential=None, ratio=1.,
+                 skew=0, iters=10, z=1.0, step=8, tol=None):
+        self._args = (center, focal, radial, tangential, ratio, skew, iters, z)
+        self._batched = isinstance(center, torch.Tensor) and center.dim() > 1
+        self.width = float(width.max() if isinstance(width, torch.Tensor) else width)
+        self.height = float(height.max() if isinstance(height, torch.Tensor) else height)
+        self.step = step
+        while True:
+            self.grid = self._solve(self._nodes(shift=0))
+            self.error = self._error()
+            if tol is None or self.error <= tol or self.step <= 1:
+                break
+            self.step = max(1, self.step // 2)
+
+    def __call__(self, pixels, index=None):
+        """ pixels (..., 2), batched (B, ..., 2) -> undistorted xy (..., 2)
+        Args
+            pixels  tensor (..., 2)
+            index   tensor long (...) [None] batched map: camera of each pixel
+                        None: leading dimension of pixels indexes cameras
+        """
+        gh, gw = self.grid.shape[-3:-1]
+        pos = pixels / self.step
+        idx = pos.floor()
+        idx[..., 0].clamp_(0, gw - 2)
+        idx[..., 1].clamp_(0, gh - 2)
+        frac = pos - idx
+        idx = idx.long()
+        flat = idx[..., 1] * gw + idx[..., 0]
+        if self._batched and index is not None:
+            flat = flat + index * gh * gw
+        elif self._batched:
+            flat = flat + _batch(torch.arange(len(self.grid), device=flat.device) * gh * gw,
+                                 flat.dim(), tail=0)
+        table = self.grid.reshape(-1, 2)
+        fx, fy = frac[..., 0:1], frac[..., 1:2]
+        return ((table[flat] * (1 - fx) + table[flat + 1] * fx) * (1 - fy) +
+                (table[flat + gw] * (1 - fx) + table[flat + gw + 1] * fx) * fy)
+
+    def _nodes(self, shift=0.):
+        """ grid pixel positions covering [0, width] x [0, height], at node or cell midpoints"""
+        center = self._args[0]
+        _shape = (int(np.ceil(self.height / self.step)) + 1 - (shift > 0),
+                  int(np.ceil(self.width / self.step)) + 1 - (shift > 0))
+        nodes = mgrid(_shape, dtype=center.dtype, shift=shift).to(device=center.device)
+        nodes = nodes.mul(self.step)
+        if self._batched:
+            nodes = nodes.expand(len(center), *nodes.shape)
+        return nodes
+
+    def _solve(self, pixels):
+        center, focal, radial, tangential, ratio, skew, iters, z = self._args
+        xy = _pixels_to_xy(pixels, center, focal, ratio, skew, z)
+        if radial is not None and tangential is not None and (radial.any() or tangential.any()):
+            ndim = pixels.dim()
+            xy = _undistort(xy, _batch(radial, ndim), _batch(tangential, ndim), iters)[0]
+        return xy
+
+    def _error(self):
+        midpoints = self._nodes(shift=0.5)
+        return (self(midpoints) - self._solve(midpoints)).abs().max().item()
+
+    def to(self, **kwargs):
+        """ kwargs device, dtype"""
+        self.grid = self.grid.to(**kwargs)
+        return self
+
 def rotate_rays(rays, rotation, row_major=True):
     """
     Args
@@ -105,85 +285,195 @@ def transform_points(points, position=None, rotation=None, row_major=False):
     return points
 
 def points_to_pixels(points, center, focal, radial=None, tangential=None,
-                     ratio=1., skew=0, position=None, rotation=None, row_major=False):
+                     ratio=1., skew=0, position=None, rotation=None, row_major=False,
+                     width=None, height=None, cull=False, depth=False):
     """Projects a 3D point (x,y,z) to a pixel position (x,y).
     out tensor (..., 2)
      Args
         points      tensor (..., 3)
 
     intrinsics
-        center      tensor (2)          [cx, cy] principal_point
-        focal       float | tensor(2)   [fx, fy] focal_
+        center      tensor (2)          [cx, cy] principal_point, batched views (V,2)
+        focal       float | tensor(2)   [fx, fy] focal_, batched views (V,2)
 
         ratio       float (1.) TODO, check, part of focal
         skew        0
 
-        radial      tensor  [k1, k2, k3]
-        tangential  tensor  [p1, p2]
+        radial      tensor  [k1, k2, k3], batched views (V,3)
+        tangential  tensor  [p1, p2], batched views (V,2)
 
     extrinsics
-        position    tensor (1, 3)
-        rotation    tensor (3, 3)
+        position    tensor (1, 3), batched views (V,3)
+        rotation    tensor (3, 3), batched views (V,3,3)
         row_major   bool [False], if True: rotation.T
+
+    culling
+        width, height   [None] image size, with cull, keep 0 <= x < width, 0 <= y < height
+        cull        bool [False] project only points in front of camera, distort only those,
+                        return visible points only, ObjDict(
+                            pixels  (M,2)
+                            index   (M,) index into points.view(-1,3)
+                            view    (M,) view index, if batched
+                            depth   (M,) camera z, if depth)
+        depth       bool [False] if not cull: return ObjDict(pixels (...,2), depth (...))
+
+    batched views: any of center, focal, rotation, position with leading V dimension,
+    without cull return pixels (V,...,2)
+    >>> out = points_to_pixels(cloud, cams.center, cams.focal, cams.radial, cams.tangential,
+                               position=cams.position, rotation=cams.rotation,
+                               width=640, height=480, cull=True, depth=True)
+    >>> image[out.view, out.pixels[:,1].long(), out.pixels[:,0].long()] = out.depth
     """
     _shape = points.shape[:-1]
-    points = points.view(-1, 3)
-    points = transform_points(points, position, rotation, row_major=row_major)
-
-    _as_tensor = {"device":points.device, "dtype":points.dtype}
-    ratio = torch.tensor([1., ratio], **_as_tensor)
-
-    xy = points[..., 0:2]/points[..., 2:3]
-    if radial is not None and tangential is not None and (any(radial) or any(tangential)):
+    points = points.reshape(-1, 3)
+    views = _num_views(center, focal, rotation, position)
+    _distort = radial is not None and tangential is not None and (radial.any() or tangential.any())
+
+    if not cull:
+        if views is None:
+            points = transform_points(points, position, rotation, row_major=row_major)
+            params = [center, focal, radial, tangential]
+        else:
+            points = _transform_views(points, views, position, rotation, row_major)
+            params = [_batch(p, 3) for p in (center, focal, radial, tangential)]
+        xy = _project(points[..., 0:2]/points[..., 2:3], *params, ratio, skew, _distort)
+        out_shape = (*_shape, 2) if views is None else (views, *_shape, 2)
+        xy = xy.reshape(out_shape)
+        if depth:
+            return ObjDict(pixels=xy, depth=points[..., 2].reshape(out_shape[:-1]))
+        return xy
+
+    out = {"pixels": [], "index": [], "view": [], "depth": []}
+    for i in range(views or 1):
+        _get = lambda param, tail=1, i=i: param[i if len(param) > 1 else 0] if (
+            isinstance(param, torch.Tensor) and param.dim() > tail) else param
+        _pos, _rot = _get(position), _get(rotation, 2)
+        if _rot is not None and row_major:
+            _rot = _rot.T
+
+        # depth of all points, transform only points in front of camera
+        _z = points @ _rot[2] if _rot is not None else points[:, 2]
+        if _pos is not None:
+            _z = _z - (_pos.reshape(3) @ _rot[2] if _rot is not None else _pos.reshape(3)[2])
+        index = (_z > 0).nonzero()[:, 0]
+        _points = points[index]
+        if _pos is not None:
+            _points = _points - _pos.reshape(1, 3)
+        if _rot is not None:
+            _points = _points @ _rot.T
+        xy = _points[:, 0:2]/_points[:, 2:3]
+
+        # cull before distortion outside undistorted image bounds, distortion polynomials
+        # fold far out of view points back into the image
+        if _distort and width is not None and height is not None:
+            low, high = _undistorted_bounds(_get(center), _get(focal), _get(radial),
+                                            _get(tangential), ratio, skew, _get(width, 0),
+                                            _get(height, 0))
+            inside = ((xy >= low) & (xy <= high)).all(-1).nonzero()[:, 0]
+            xy, index, _points = xy[inside], index[inside], _points[inside]
+
+        xy = _project(xy, _get(center), _get(focal), _get(radial), _get(tangential), ratio, skew,
+                      _distort)
+
+        # cull outside image
+        if width is not None or height is not None:
+            inside = torch.ones(len(xy), dtype=torch.bool, device=xy.device)
+            for j, size in ((0, _get(width, 0)), (1, _get(height, 0))):
+                if size is not None:
+                    inside &= (xy[:, j] >= 0) & (xy[:, j] < size)
+            xy, index, _points = xy[inside], index[inside], _points[inside]
+
+        out["pixels"].append(xy)
+        out["index"].append(index)
+        out["view"].append(torch.full_like(index, i))
+        out["depth"].append(_points[:, 2])
+
+    keys = ["pixels", "index"] + (["view"] if views is not None else []) + (["depth"] if depth else [])
+    return ObjDict({key: torch.cat(out[key]) for key in keys})
+
+def _undistorted_bounds(center, focal, radial, tangential, ratio, skew, width, height,
+                        samples=64, margin=0.05):
+    """ bounding box (low (2), high (2)) of undistorted image border, expanded by margin"""
+    _as_tensor = {"device":center.device, "dtype":center.dtype}
+    side = torch.linspace(0, 1, samples, **_as_tensor)
+    zeros, ones = torch.zeros_like(side), torch.ones_like(side)
+    border = torch.cat([torch.stack(xy, -1) for xy in ((side, zeros), (side, ones),
+                                                        (zeros, side), (ones, side))])
+    border = border * torch.tensor([float(width), float(height)], **_as_tensor)
+    xy = _pixels_to_xy(border, center, focal, ratio, skew)
+    xy = _undistort(xy, radial, tangential)[0]
+    low, high = xy.min(0)[0], xy.max(0)[0]
+    pad = (high - low) * margin
+    return low - pad, high + pad
+
+def _num_views(center, focal, rotation, position):
+    """ leading batch size of batched view params, None if unbatched
+    center, focal (V,2), rotation (V,3,3) or position (V,3) if V > 1; position (1,3) is unbatched
+    """
+    for param, tail in ((center, 1), (focal, 1), (rotation, 2)):
+        if isinstance(param, torch.Tensor) and param.dim() > tail:
+            return len(param)
+    if isinstance(position, torch.Tensor) and position.dim() > 1 and len(position) > 1:
+        return len(position)
+    return None
+
+def _transform_views(points, views, position=None, rotation=None, row_major=False):
+    """ points (N,3) to V camera frames (V,N,3), position (V,3) | (3), rotation (V,3,3) | (3,3)"""
+    if position is not None:
+        points = points - position.reshape(-1, 1, 3)
+    points = points.expand(views, *points.shape[-2:])
+    if rotation is not None:
+        rotation = rotation.expand(views, 3, 3)
+        points = torch.einsum('vji,vnj->vni' if row_major else 'vij,vnj->vni', rotation, points)
+    return points
 
-        # Radial distortion.
+def _project(xy, center, focal, radial, tangential, ratio, skew, distort):
+    """ normalized image plane xy (...,2) to pixels, params broadcastable to xy"""
+    ratio = torch.tensor([1., ratio], device=xy.device, dtype=xy.dtype)
+    if distort:
         r2 = torch.sum(xy**2, axis=-1, keepdims=True)
-        xy.mul_(1.0 + r2 * (radial[0] + r2 * (radial[1] + radial[2] * r2)))
-
-        # Tangential distorsion
-        xy.add_(2.0 * tangential * xy.prod(axis=-1, keepdims=True) +
-                tangential.flip(-1) * (r2 + 2.0 * xy**2))
-
-        # Map to image plane
+        # Radial and tangential distortion of undistorted xy
+        xy = (xy * (1.0 + r2 * (radial[..., 0:1] + r2 * (radial[..., 1:2] + radial[..., 2:3] * r2)))
+              + 2.0 * tangential * xy.prod(axis=-1, keepdims=True)
+              + tangential.flip(-1) * (r2 + 2.0 * xy**2))
+    else:
+        xy = xy.clone()
+
+    # Map to image plane
+    if skew:
         xy[..., 0].add_(xy[..., 1].mul(skew))
-        xy.mul_(ratio*focal).add_(center)
-
-    return xy.reshape((*_shape, 2))
+    return xy.mul_(ratio*focal).add_(center)
 
 def copy_vals(fro, to, repeat=False):
-    """ copies into tensor
+    """ copies into tensor, returns <to>, tensors are modified in place
     Args
         to      int, float, torch.Tensor
         fro     int, float, torch.Tensor, np.ndarray
     """
-    _grad = to.requires_grad
     if isinstance(to, (int, float)):
-        to = type(to)(fro)
+        return type(to)(fro)
 
-    elif isinstance(to, torch.Tensor):
-        _asto = {"dtype":to.dtype, "device":to.device}
+    _grad = to.requires_grad
+    _asto = {"dtype":to.dtype, "device":to.device}
+    with torch.no_grad():
         if isinstance(fro, (int, float)):
             if repeat:
-                to[:] = to.mul(0).add(fro)
+                to.fill_(fro)
             else:
-                to[0] = fro
-        elif isinstance(fro, torch.Tensor) and fro.shape == to.shape and not to.requires_grad:
-            to = fro.clone().detach().to(**_asto)
-        elif isinstance(fro, np.ndarray) and tuple(to.shape) == tuple(fro.shape):
-            to[:] = torch.as_tensor(fro, **_asto)
+                to.view(-1)[0] = fro
+        elif isinstance(fro, (torch.Tensor, np.ndarray)) and tuple(fro.shape) == tuple(to.shape):
+            to.copy_(torch.as_tensor(fro, **_asto))
         else:
             if isinstance(fro, np.ndarray):
                 fro = fro.reshape(-1)
-            _shape = to.shape
-            to = to.view(-1)
-            _len = len(fro) if repeat else min(len(to), len(fro))
+            _flat = to.view(-1)
+            _len = len(fro) if repeat else min(len(_flat), len(fro))
             for i in range(_len):
                 _val = fro[i%len(fro)]
                 _val = _val if isinstance(_val, (int, float)) else _val.item()
-                to[i] = _val
-            to = to.view(_shape)
-
+                _flat[i % len(_flat)] = _val
     to.requires_grad = _grad
+    return to
 
 
 class Camera:
@@ -201,6 +491,10 @@ class Camera:
     >>> Cam.from_colmap_scene(pycolmap.scene)
     >>> ...
     >>> Cam.to(device="cuda")
+    # batched cameras, tensors stacked on a leading dimension
+    >>> Cams = Camera.stack([Cam0, Cam1, Cam2])
+    >>> rays = Cams.rays(pixels)    # pixels (3, N, 2) -> rays (3, N, 3)
+    >>> Cams[1]                     # Camera
     """
     def __init__(self, **kwargs):
         _x = 100.0
@@ -218,11 +512,89 @@ class Camera:
 
     def __repr__(self):
         rep = self.__class__.__name__+"("
-        for i, k in enumerate(self.__dict__):
-            rep += "\n  " + k + "=" + str(self.__dict__[k])
+        for k in self.__dict__:
+            if k[0] != "_":
+                rep += "\n  " + k + "=" + str(self.__dict__[k])
         rep += "\n)"
         return rep
 
+    @classmethod
+    def stack(cls, cameras):
+        """ batched Camera from list of Cameras, tensors are stacked on a new leading dimension
+        height and width become tensors (B,)
+        """
+        out = cls.__new__(cls)
+        for key, val in cameras[0].__dict__.items():
+            if key[0] == "_": # cache
+                continue
+            vals = [cam.__dict__[key] for cam in cameras]
+            if isinstance(val, torch.Tensor):
+                out.__dict__[key] = torch.stack(vals)
+            elif isinstance(val, (int, float)):
+                out.__dict__[key] = torch.tensor(vals, dtype=cameras[0].center.dtype)
+            else:
+                out.__dict__[key] = vals
+        return out
+
+    @property
+    def batch_size(self):
+        """ number of stacked cameras, None if not batched"""
+        return len(self.center) if self.center.dim() > 1 else None
+
+    def __len__(self):
+        return self.batch_size or 1
+
+    def __getitem__(self, index):
+        """ Camera or sub batch of stacked Camera"""
+        assert self.batch_size is not None, "only batched Camera can be indexed"
+        out = self.__class__.__new__(self.__class__)
+        for key, val in self.__dict__.items():
+            if key[0] == "_": # cache
+                continue
+            if isinstance(val, torch.Tensor) and val.dim() and len(val) == self.batch_size:
+                val = val[index]
+                if key in ("height", "width") and not val.dim():
+                    val = val.item()
+            elif isinstance(val, list) and len(val) == self.batch_size:
+                val = val[index]
+            out.__dict__[key] = val
+        return out
+
+    def rays(self, pixels, extrinsics=True, undistort=False, step=8, map_tol=None, **kwargs):
+        """ pixels_to_rays() with camera intrinsics, and rotation if extrinsics
+        Args
+            pixels      tensor (...,2), if batched (B,...,2)
+            extrinsics  bool [True] rotate rays by self.rotation
+            undistort   bool [False] use cached UndistortMap, see undistort_map()
+            step        int [8] UndistortMap step
+            map_tol     float [None] UndistortMap tol
+            kwargs      ratio, skew, iters, tol, z, normalize, stats see pixels_to_rays()
+        """
+        if undistort:
+            _keys = ("ratio", "skew", "iters", "z")
+            _map = self.undistort_map(step, map_tol,
+                                      **{k: kwargs[k] for k in _keys if k in kwargs})
+            kwargs = {k: kwargs[k] for k in kwargs if k not in _keys or k == "z"}
+            kwargs["undistort"] = _map
+        return pixels_to_rays(pixels, self.center, self.focal, self.radial, self.tangential,
+                              rotation=self.rotation if extrinsics else None, **kwargs)
+
+    def undistort_map(self, step=8, tol=None, **kwargs):
+        """ UndistortMap of camera, cached until intrinsics, size, device or args change
+        Args
+            step, tol   see UndistortMap
+            kwargs      ratio, skew, iters, z, see pixels_to_rays()
+        """
+        params = [self.center, self.focal, self.radial, self.tangential]
+        key = (self.center.device, self.center.dtype, step, tol, tuple(sorted(kwargs.items())),
+               tuple(torch.cat([p.reshape(-1) for p in params]).tolist()),
+               str(self.width), str(self.height))
+        cached = self.__dict__.get("_undistort")
+        if cached is None or cached[0] != key:
+            _map = UndistortMap(self.width, self.height, *params, step=step, tol=tol, **kwargs)
+            self.__dict__["_undistort"] = cached = (key, _map)
+        return cached[1]
+
     def to(self, **kwargs):
         """
             kwargs
@@ -246,13 +618,13 @@ class Camera:
         """
         for key in kwargs:
             if key in self.__dict__:
-                copy_vals(kwargs[key], self.__dict__[key])
+                self.__dict__[key] = copy_vals(kwargs[key], self.__dict__[key])
             elif key == "k1":
                 self.radial[0] = kwargs[key]
             elif key == "k2":
                 self.radial[1] = kwargs[key]
             elif key == "k3":
-                self.radial[3] = kwargs[key]
+                self.radial[2] = kwargs[key]
             elif key == "p1":
                 self.tangential[0] = kwargs[key]
             elif key == "p2":
@@ -313,3 +685,84 @@ class Camera:
         """
         self.from_colmap(cam=scene.cameras[scene.images[index].camera_id],
                          img=scene.images[index])
+
+
+class RaySampler:
+    """ random rays across cameras, without materializing pixel grids
+    flat pixel indices drawn with unique_randint() are split to pixel positions in int64
+
+    Args
+        cameras     Camera, batched with Camera.stack() or single
+        stratified  bool [True] same number of rays from every camera, else uniform over all pixels
+        jitter      bool [False] uniform random position within pixel, else pixel center
+        undistort   bool [False] use camera UndistortMap, see Camera.undistort_map()
+        kwargs      step, map_tol for UndistortMap, ratio, skew, iters, tol, z, normalize
+                    see pixels_to_rays()
+
+    Examples
+    >>> sampler = RaySampler(Camera.stack(cameras))
+    >>> batch = sampler(4096)
+    >>> batch.origins, batch.directions # (4096, 3) world origins and directions as Camera.rays()
+    >>> batch.camera, batch.index       # (4096,) camera index, flat pixel index y*width + x
+    """
+    def __init__(self, cameras, stratified=True, jitter=False, undistort=False, **kwargs):
+        self.cameras = cameras if cameras.batch_size is not None else Camera.stack([cameras])
+        self.stratified = stratified
+        self.jitter = jitter
+        self.undistort = undistort
+        self.kwargs = kwargs
+        _sizes = torch.stack([torch.as_tensor(self.cameras.height),
+                              torch.as_tensor(self.cameras.width)], dim=-1).long()
+        self.sizes = _sizes.view(-1, 2).expand(len(self.cameras), 2)
+        self.numel = self.sizes.prod(-1)
+        self.offsets = torch.cumsum(self.numel, 0) - self.numel
+
+    def __len__(self):
+        """ total number of pixels"""
+        return int(self.numel.sum())
+
+    def sample(self, num):
+        """ returns (camera index (num,), flat pixel index (num,)) unique per camera"""
+        if not self.stratified:
+            flat = unique_randint(0, len(self), num)
+            camera = torch.searchsorted(self.offsets, flat, right=True) - 1
+            return camera, flat - self.offsets[camera]
+
+        counts = torch.full((len(self.cameras),), num // len(self.cameras), dtype=torch.int64)
+        counts[torch.randperm(len(self.cameras))[:num % len(self.cameras)]] += 1
+        camera = torch.repeat_interleave(torch.arange(len(self.cameras)), counts)
+        index = torch.cat([unique_randint(0, int(numel), int(count))
+                           for numel, count in zip(self.numel, counts) if count])
+        return camera, index
+
+    def pixels(self, camera, index):
+        """ pixel positions (N,2) [x, y] of flat indices
+        row and column are split in int64, float32 indices are not exact above 2^24 pixels
+        """
+        width = self.sizes[camera, 1]
+        out = torch.stack([index % width, index // width], dim=-1).to(
+            dtype=self.cameras.center.dtype)
+        out.add_(0. if self.jitter else 0.5)
+        if self.jitter:
+            out.add_(torch.rand_like(out))
+        return out
+
+    def __call__(self, num):
+        """ returns ObjDict(origins, directions, pixels, camera, index) of num random rays"""
+        camera, index = self.sample(num)
+        device = self.cameras.center.device
+        pixels = self.pixels(camera, index).to(device=device)
+        camera, index = camera.to(device=device), index.to(device=device)
+        kwargs = {k: v for k, v in self.kwargs.items() if k not in ("step", "map_tol")}
+        cams = self.cameras
+        if self.undistort:
+            _keys = ("ratio", "skew", "iters", "z")
+            _map = cams.undistort_map(self.kwargs.get("step", 8), self.kwargs.get("map_tol"),
+                                      **{k: kwargs[k] for k in _keys if k in kwargs})
+            kwargs = {k: kwargs[k] for k in kwargs if k not in _keys or k == "z"}
+            kwargs["undistort"] = lambda pix: _map(pix, camera)
+        directions = pixels_to_rays(pixels, cams.center[camera], cams.focal[camera],
+                                    cams.radial[camera], cams.tangential[camera],
+                                    rotation=cams.rotation[camera], **kwargs)
+        return ObjDict(origins=cams.position[camera], directions=directions, pixels=pixels,
+                       camera=camera, index=index)
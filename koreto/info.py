@@ -45,7 +45,9 @@ def entropy(x: Tensor,
             low: float = 0,
             high: float = 0,
             base: Optional[float] = 2.,
-            axis: int = 0) -> Union[Tensor, tuple]:
+            axis: int = 0,
+            bins: Union[int, str, None] = None,
+            chunk: Optional[int] = None) -> Union[Tensor, tuple]:
     """ Returns data entropy and entropy per item if num_fixed_axis > 0
     -> (entropy, entropies) or > entrooy
     where entropies is the entropy of each batch element ( if num_fixed_axis == 1)
@@ -53,45 +55,301 @@ def entropy(x: Tensor,
         x           tensor
         num_fixed_axes (int [0]) in {0, tensor.ndim}, 0 returns only total entropy
         low, high, same as in torch.histc(min, max), if both are zero, are ignored.
-        base        (float [2]) number of bits, None uses number of items
+        base        (float [2]) number of bits, None uses number of bins
         axis    int [0] if num_fixed_axes >= 1, defaults to measure batch dimesnion, axis 0
             when x: N,C,H,W or channel with x: C,H,W
+        bins        (int, str [None]) histogram bins, None: one bin per item
+            'sqrt': sqrt(items), 'fd': Freedman–Diaconis, bin width 2*IQR/items^(1/3)
+        chunk       (int [None]) max items histogrammed at once, bounds temporary memory;
+            histogram memory is bounded by bins, bins=None allocates one bin per item
     Example:
     >>> tensor=torch.randn(2,3,25,25)
     >>> Hs,Ht = entropy(torch.randn(2,3,25,25), num_fixed_axes=2)
     # Out[*] (tensor(0.8872), tensor([0.8709, 0.8681, 0.8771, 0.8620, 0.8698, 0.8617]))
     # total entropy, and entropy of each of (6) 25x25 datapoints
+    >>> H = entropy(activations, bins='fd', chunk=2**24) # large tensors, bounded bins
     """
-    if not x.dtype.is_floating_point:
-        _dtype = torch.float64 if x.itemsize == 8 else torch.float32
-        x = x.to(dtype=_dtype)
-
-    out_h = _entropy(x, low=low, high=high, base=base)
+    out_h = _entropy(x, low=low, high=high, base=base, bins=bins, chunk=chunk)
     if num_fixed_axes == 0:
         return out_h
 
     x = tensor_flat2(x, axis=axis, num=num_fixed_axes)
     # compute entropy for each element
-    sub_h = torch.stack([_entropy(_t, low=low, high=high, base=base) for _t in x], dim=0)
+    rows = len(x) if chunk is None else max(1, chunk // x.shape[1])
+    sub_h = torch.cat([_batch_entropy(_as_float(_x), low=low, high=high, base=base, bins=bins)
+                       for _x in x.split(rows)])
     return out_h, sub_h
 
 
-def _entropy(x: Tensor, low: float, high: float, base: Optional[float] = 2.) -> Tensor:
+def _as_float(x: Tensor) -> Tensor:
+    if not x.dtype.is_floating_point:
+        _dtype = torch.float64 if x.itemsize == 8 else torch.float32
+        x = x.to(dtype=_dtype)
+    return x
+
+
+def _num_bins(x: Tensor,
+              bins: Union[int, str, None],
+              low: Tensor,
+              high: Tensor,
+              num: Optional[int] = None,
+              sample: int = 2**20) -> Union[int, Tensor]:
+    """ number of histogram bins for rows of x
+    Args
+        x           tensor (rows, N)
+        bins        (int, str) None: N, int, 'sqrt': sqrt(N), 'fd': Freedman–Diaconis,
+            'sqrt' for rows with interquartile range 0
+        low, high   tensors (rows, 1) histogram range
+        num         (int [None]) items per row, if x is a sample, default N
+        sample      (int [2**20]) max items used to estimate interquartile range
+    Returns int or, for 'fd', tensor (rows, 1)
+    """
+    num = x.shape[1] if num is None else num
+    if bins is None:
+        return num
+    if isinstance(bins, int):
+        return bins
+    if bins == 'sqrt':
+        return math.ceil(num**0.5)
+    assert bins == 'fd', f"bins expected in (None, int, 'sqrt', 'fd') got {bins}"
+    cols = max(sample // len(x), 1)
+    if x.shape[1] > cols:
+        x = x[:, torch.randint(0, x.shape[1], (cols,), device=x.device)]
+    quartiles = torch.tensor([0.25, 0.75], dtype=x.dtype, device=x.device)
+    quartiles = torch.quantile(x, quartiles, dim=1, keepdim=True)
+    width = 2 * (quartiles[1] - quartiles[0]) / num**(1/3)
+    nbins = (high - low).div(width).nan_to_num(1, 1, 1).ceil()
+    # IQR 0, half the items or more are one value, e.g. sparse activations: 'sqrt' rule
+    nbins = torch.where(width > 0, nbins, torch.full_like(nbins, math.ceil(num**0.5)))
+    return nbins.clamp(1, num).long()
+
+
+def _entropy(x: Tensor,
+             low: float,
+             high: float,
+             base: Optional[float] = 2.,
+             bins: Union[int, str, None] = None,
+             chunk: Optional[int] = None) -> Tensor:
     """ entropy of a tensor, number of bit it takes to encode each pixel
         Σ(-p.log2(p))
     Args
         x           tensor
         low, high   float if 0 & 0 are ignored, otherwise compute entrpy within range
-        base        (int [2]) log base, number of bits, None: number of events
+        base        (int [2]) log base, number of bits, None: number of bins
+        bins        (int, str [None]) None: len(x), int, 'sqrt', 'fd', see entropy()
+        chunk       (int [None]) if set, histogram is accumulated over chunks of x
+            converting one chunk at a time to float, temporary memory is bounded by chunk,
+            histogram memory by bins
     """
     x = x.reshape(-1)
-    p = torch.histc(x, len(x), low, high)/len(x)
-    p = p[p > 0]
-    base = len(x) if base is None else base
-    return torch.sum(-1.*p*torch.log(p).div(np.log(base)))
+    num = len(x)
+    chunks = x.split(num if chunk is None else chunk)
+    if low == 0 and high == 0:
+        low, high = zip(*[_as_float(_x).aminmax() for _x in chunks])
+        low, high = min(low).item(), max(high).item()
+
+    _sample = x # iqr from at most 2**20 items
+    if bins == 'fd' and num > 2**20:
+        _sample = x[torch.randint(0, num, (2**20,), device=x.device)]
+    _sample = _as_float(_sample).view(1, -1)
+    _range = {"dtype": _sample.dtype, "device": _sample.device}
+    nbins = int(_num_bins(_sample, bins, torch.tensor([[low]], **_range),
+                          torch.tensor([[high]], **_range), num=num))
+
+    # one histogram, chunks add bin counts: temporary memory is bounded by chunk [2**22],
+    # the histogram itself by bins, with bins=None, one bin per item
+    dtype = _as_float(chunks[0]).dtype
+    if low == high: # as torch.histc
+        low, high = low - 1, high + 1
+    _low, _high = [torch.tensor(val, dtype=dtype, device=x.device) for val in (low, high)]
+    hist = torch.zeros(nbins, dtype=torch.float64, device=x.device)
+    for _x in x.split(chunk or 2**22):
+        _x = _as_float(_x)
+        _x = _x[(_x >= _low) & (_x <= _high)]
+        idx = (_x - _low).mul_(nbins).div_(_high - _low).long().clamp_(0, nbins - 1)
+        hist.index_add_(0, idx, torch.ones(1, dtype=hist.dtype, device=x.device).expand(len(idx)))
+    hist.div_(num)
+    base = nbins if base is None else base
+    _entr = sum(torch.special.entr(_h).sum() for _h in hist.split(chunk or 2**22))
+    return _entr.div(np.log(base)).to(dtype=dtype)
     # return torch.sum(-1*_th*torch.log(_th)).div(math.log(_n))
 
 
+def _batch_entropy(x: Tensor,
+                   low: float,
+                   high: float,
+                   base: Optional[float] = 2.,
+                   bins: Union[int, str, None] = None) -> Tensor:
+    """ entropy of each row of a 2d tensor, in one pass
+        same as torch.stack([_entropy(row, low, high, base, bins) for row in x])
+    histograms of all rows are computed with a single bincount over row offset bin indices
+    Args
+        x           tensor (rows, N)
+        low, high   float if 0 & 0 are ignored, otherwise compute entrpy within range
+        base        (int [2]) log base, number of bits, None: number of bins
+        bins        (int, str [None]) None: N, int, 'sqrt', 'fd', see entropy()
+    """
+    rows, num = x.shape
+    _in_range = low == 0 and high == 0
+    if _in_range:
+        low, high = x.aminmax(dim=1, keepdim=True)
+    else:
+        low = torch.full((rows, 1), low, dtype=x.dtype, device=x.device)
+        high = torch.full((rows, 1), high, dtype=x.dtype, device=x.device)
+    _same = low == high # as torch.histc
+    low = torch.where(_same, low - 1, low)
+    high = torch.where(_same, high + 1, high)
+
+    nbins = _num_bins(x, bins, low, high)
+    stride = nbins if isinstance(nbins, int) else nbins.max().item()
+    idx = (x - low).mul_(nbins).div_(high - low).long()
+    idx = torch.minimum(idx.clamp_(min=0), torch.as_tensor(nbins - 1, device=x.device))
+    idx += torch.arange(0, rows * stride, stride, device=x.device).unsqueeze(1)
+    idx = idx.view(-1)
+    if not _in_range:
+        idx = idx[((x >= low) & (x <= high)).view(-1)]
+    p = torch.bincount(idx, minlength=rows * stride).view(rows, stride).to(dtype=x.dtype).div_(num)
+    base = nbins if base is None else base
+    return torch.special.entr(p).sum(dim=1).div(torch.log(torch.as_tensor(base, dtype=x.dtype,
+                                                                          device=x.device)).view(-1))
+
+
+class EntropyAccumulator:
+    """ histogram entropy of data seen over many batches, memory bounded by bins
+    if no range is given, it is set by the first batch and grown to fit later batches,
+    doubling bin width by merging pairs of bins: entropy is then approximately that of
+    entropy(all_data, low=acc.low, high=acc.high, bins=acc.bins), range may grow up to 4x data
+    Examples
+    >>> acc = EntropyAccumulator(bins=1024)
+    >>> for batch in loader:
+    >>>     acc.update(activations(batch))
+    >>> H = acc.compute()
+    Args
+        bins        (int [1024]) even
+        low, high   (float [0, 0]) as in torch.histc, if both zero, range grows from data
+        base        (float [2]) number of bits, None uses number of bins
+    """
+    def __init__(self, bins: int = 1024, low: float = 0, high: float = 0,
+                 base: Optional[float] = 2.):
+        assert not bins%2, f"even bins required, got {bins}"
+        self.bins = bins
+        self.low = low
+        self.high = high
+        self.base = base
+        self.num = 0
+        self.hist = None
+        self._fixed = not (low == 0 and high == 0)
+
+    def update(self, x: Tensor) -> None:
+        """ add batch to histogram"""
+        x = _as_float(x.detach()).reshape(-1)
+        if not self._fixed:
+            low, high = [v.item() for v in x.aminmax()]
+            if not (math.isfinite(low) and math.isfinite(high)):
+                raise ValueError(f"cannot grow histogram range to non finite data ({low}, {high})"
+                                 ", filter x or set low, high")
+            if self.hist is None:
+                self.low, self.high = (low - 1, high + 1) if low == high else (low, high)
+            self._grow(low, high)
+        if self.hist is None:
+            self.hist = torch.zeros(self.bins, dtype=torch.float64, device=x.device)
+        self.hist += torch.histc(x, self.bins, self.low, self.high).to(dtype=torch.float64)
+        self.num += len(x)
+
+    def _grow(self, low: float, high: float) -> None:
+        while low < self.low or high > self.high:
+            width = self.high - self.low
+            if self.hist is not None:
+                merged = self.hist.view(-1, 2).sum(dim=1)
+                zeros = torch.zeros_like(merged)
+                self.hist = torch.cat([merged, zeros] if high > self.high else [zeros, merged])
+            if high > self.high:
+                self.high = self.low + 2 * width
+            else:
+                self.low = self.high - 2 * width
+
+    def compute(self) -> Tensor:
+        """ entropy of all data seen"""
+        p = self.hist / self.num
+        base = self.bins if self.base is None else self.base
+        return torch.special.entr(p).sum().div(np.log(base))
+
+
+class CovarianceAccumulator:
+    """ running sum and Gram matrix XᵀX of (samples, features) over many batches
+    computes covariance, eigen values and ESD of all samples without holding them in memory
+    memory is features², features, product of non fixed dims, need to be moderate
+    Examples
+    >>> acc = CovarianceAccumulator()
+    >>> for batch in loader:
+    >>>     acc.update(activations(batch))  # (N, ...) -> (N, features)
+    >>> cov = acc.compute()
+    >>> evals = acc.eigen_vals()            # as eigen_vals(all_samples)
+    >>> x, y = acc.esd()                    # as esd(all_samples)
+    Args
+        num_fixed_axes  (int [1]) leading axes flattened to samples, as in tensor_flat2()
+        dtype           (torch.dtype [torch.float64]) accumulation dtype
+    """
+    def __init__(self, num_fixed_axes: int = 1, dtype: torch.dtype = torch.float64):
+        self.num_fixed_axes = num_fixed_axes
+        self.dtype = dtype
+        self.num = 0
+        self.sum = None
+        self.gram = None
+        self.shape = None
+
+    def update(self, x: Tensor) -> None:
+        """ add batch of samples"""
+        if self.shape is None:
+            self.shape = tuple(x.shape[self.num_fixed_axes:])
+        x = tensor_flat2(x.detach(), num=self.num_fixed_axes).to(dtype=self.dtype)
+        if self.gram is None:
+            self.gram = torch.zeros(x.shape[1], x.shape[1], dtype=self.dtype, device=x.device)
+            self.sum = torch.zeros(x.shape[1], dtype=self.dtype, device=x.device)
+        self.gram.addmm_(x.T, x)
+        self.sum += x.sum(dim=0)
+        self.num += len(x)
+
+    def compute(self) -> Tensor:
+        """ covariance matrix of all samples, as covariance(x, x)"""
+        mean = self.sum / self.num
+        return (self.gram - self.num * torch.outer(mean, mean)) / (self.num - 1)
+
+    def eigen_vals(self) -> Tensor:
+        """ eigen values of samples, as eigen_vals(): singular_vals^2/len(singular_vals)"""
+        num = min(self.num, len(self.gram))
+        evals = torch.linalg.eigvalsh(self.gram).flip(0)[:num].clamp(min=0)
+        return evals / num
+
+    def esd(self, norm: bool = False) -> tuple:
+        """ empirical spectral distribution of samples, as esd()"""
+        return _esd(self.eigen_vals(), norm=norm)
+
+
+class PCAAccumulator(CovarianceAccumulator):
+    """ running principal component analysis, as pca(all_samples, components)
+    components are eigen vectors of the feature Gram matrix scaled by singular values,
+    sign may differ from pca()
+    Examples
+    >>> acc = PCAAccumulator()
+    >>> for batch in loader:
+    >>>     acc.update(batch)
+    >>> components = acc.compute(8)   # (8, *batch.shape[1:])
+    """
+    def compute(self, components: int = 8, normalize: bool = False) -> Tensor:
+        """ principal components
+        Args
+            components      int, number of componenets returned
+            normalize       bool [False] normalizes outputs to 1
+        """
+        evals, evecs = torch.linalg.eigh(self.gram)
+        evals = evals.flip(0)[:components].clamp(min=0)
+        out = (evecs.flip(1)[:, :components] * evals.sqrt()).T.reshape(components, *self.shape)
+        if normalize:
+            out.div_(torch.linalg.norm(out))
+        return out
+
+
 def eigen_vals_low_rank(x: Tensor, num_fixed_axes: int = 1, components: int = 64) -> Tensor:
     """ Eigen Values of Vectors using fast SVD per batch element
     Args
@@ -5,6 +5,12 @@ simple loggers
 """
 from typing import Any, Union, Optional
 import sys
+import re
+import csv
+import io
+import json
+import time
+import atexit
 import datetime
 from functools import wraps
 import os
@@ -14,6 +20,7 @@ import torch
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from scipy.signal import lfilter
 
 from .utils import ObjDict
 
@@ -50,7 +57,7 @@ def contiguous(msg=None):
         return wrapper
     return decorator
 
-__all__ = ["sround", "Col", "PLog", "plotlog"]
+__all__ = ["sround", "Col", "PLog", "NpyLog", "LogTail", "EWM", "plotlog", "read_log"]
 def sround(x: Union[np.ndarray, float, list, tuple], digits: int=1) -> Any:
     """ 'smart' round to largest `digits` + 1
     Args
@@ -104,6 +111,299 @@ class Col:
         else:
             print(*args, **kwargs)
 
+def log_segments(name: str) -> list:
+    """ existing csv segments of a log, in order: name, <root>.1<ext>, <root>.2<ext> ...
+    segments are written by a buffered PLog when new columns are added
+    """
+    folder, base = osp.split(name)
+    root, ext = osp.splitext(base)
+    if not osp.isdir(folder):
+        return []
+    _seg = re.compile(rf"{re.escape(root)}\.(\d+){re.escape(ext)}$")
+    out = [(_seg.match(f.name), f.path) for f in os.scandir(folder)]
+    out = [path for _, path in sorted((int(m.group(1)), path) for m, path in out if m)]
+    if osp.isfile(name):
+        out.insert(0, name)
+    return out
+
+def _segment_name(name: str, index: int) -> str:
+    if not index:
+        return name
+    root, ext = osp.splitext(name)
+    return f"{root}.{index}{ext}"
+
+def read_log(name: str, columns: Optional[list] = None) -> Optional[pd.DataFrame]:
+    """ reads csv log and its segments, or NpyLog folder, into a single DataFrame
+    columns missing in earlier segments are filled with nan
+    Args
+        name    (str) csv file or NpyLog folder
+        columns (list [None]) read only these columns, if present
+    """
+    if NpyLog.exists(name):
+        return NpyLog(name).read(columns)
+    segments = log_segments(name)
+    if not segments:
+        return None
+    usecols = None if columns is None else lambda col: col in columns
+    if len(segments) == 1:
+        return pd.read_csv(segments[0], usecols=usecols)
+    return pd.concat([pd.read_csv(seg, usecols=usecols) for seg in segments], ignore_index=True)
+
+
+class NpyLog:
+    """ appendable columnar log: a folder with one raw binary file per column and a manifest
+        <folder>/manifest.json  {"len": rows, "columns": {key: {"file": , "dtype": }}}
+        <folder>/c<i>.bin       column i, raw, int64 or float64
+    columns are read as memory maps, reading one column does not touch the others
+    rows past manifest "len" are ignored, the manifest is written after the data.
+    Only numeric columns are stored; int columns become float64 if nan values are logged
+
+    Examples
+    >>> store = NpyLog("train.npylog")
+    >>> store.append({"Iter": [1, 2], "Loss": [0.3, 0.2]})
+    >>> loss = store.column("Loss") # np.memmap
+    >>> data = store.read()         # pd.DataFrame
+    """
+    manifest = "manifest.json"
+
+    def __init__(self, folder: str):
+        self.folder = osp.abspath(osp.expanduser(folder))
+        self.len = 0
+        self.columns = {}
+        self.refresh()
+
+    @classmethod
+    def exists(cls, folder: str) -> bool:
+        """ True if folder is an NpyLog"""
+        return osp.isfile(osp.join(folder, cls.manifest))
+
+    def refresh(self):
+        """ reload manifest written by this or another process"""
+        if NpyLog.exists(self.folder):
+            with open(osp.join(self.folder, self.manifest), 'r', encoding='utf8') as _fi:
+                _manifest = json.load(_fi)
+            self.len = _manifest["len"]
+            self.columns = _manifest["columns"]
+
+    def _write_manifest(self):
+        _name = osp.join(self.folder, self.manifest)
+        with open(_name + ".tmp", 'w', encoding='utf8') as _fi:
+            json.dump({"len": self.len, "columns": self.columns}, _fi)
+        os.replace(_name + ".tmp", _name)
+
+    def _path(self, key: str) -> str:
+        return osp.join(self.folder, self.columns[key]["file"])
+
+    def _add_column(self, key: str, dtype: str):
+        self.columns[key] = {"file": f"c{len(self.columns)}.bin", "dtype": dtype}
+        np.full(self.len, np.nan, dtype=dtype).tofile(self._path(key))
+
+    def _promote(self, key: str):
+        """ int column to float64 to hold nan"""
+        data = self.column(key).astype(np.float64)
+        self.columns[key]["dtype"] = "float64"
+        data.tofile(self._path(key))
+
+    def append(self, rows: dict):
+        """ append rows {key: list of values}, all lists of same length
+        missing keys are filled with nan, new keys are filled with nan for previous rows
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        rows = {key: np.asarray(val).reshape(-1) for key, val in rows.items()}
+        _lens = {len(val) for val in rows.values()}
+        assert len(_lens) == 1, f"multiple column lengths found, {_lens}"
+        num = _lens.pop()
+        for key, val in rows.items():
+            assert val.dtype.kind in "biuf", f"only numeric columns, got {key}: {val.dtype}"
+            if key not in self.columns:
+                self._add_column(key, "int64" if val.dtype.kind in "biu" and not self.len
+                                 else "float64")
+            elif val.dtype.kind == "f" and self.columns[key]["dtype"] == "int64":
+                self._promote(key)
+        for key in self.columns:
+            if key not in rows:
+                if self.columns[key]["dtype"] == "int64":
+                    self._promote(key)
+                rows[key] = np.full(num, np.nan)
+            # truncate rows beyond manifest len, left from an interrupted append
+            with open(self._path(key), 'r+b') as _fi:
+                _fi.truncate(self.len * np.dtype(self.columns[key]["dtype"]).itemsize)
+                _fi.seek(0, os.SEEK_END)
+                rows[key].astype(self.columns[key]["dtype"]).tofile(_fi)
+        self.len += num
+        self._write_manifest()
+
+    def column(self, key: str) -> np.ndarray:
+        """ read only memory map of a column"""
+        dtype = self.columns[key]["dtype"]
+        if not self.len:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._path(key), dtype=dtype, mode='r', shape=(self.len,))
+
+    def read(self, columns: Optional[list] = None) -> pd.DataFrame:
+        """ DataFrame of all or selected columns"""
+        self.refresh()
+        columns = [key for key in self.columns if columns is None or key in columns]
+        return pd.DataFrame({key: self.column(key) for key in columns})
+
+
+class _Buffer:
+    """ growable 1d array, amortized O(1) appends, dtype promoted as needed"""
+    def __init__(self, dtype=np.float64):
+        self._data = np.empty(0, dtype=dtype)
+        self.len = 0
+
+    @property
+    def values(self) -> np.ndarray:
+        """ view of stored values"""
+        return self._data[:self.len]
+
+    def extend(self, values: np.ndarray):
+        """ append values"""
+        values = np.asarray(values).reshape(-1)
+        dtype = np.result_type(self._data.dtype, values.dtype) if self.len else values.dtype
+        if self.len + len(values) > len(self._data) or dtype != self._data.dtype:
+            data = np.empty(max(2 * len(self._data), self.len + len(values), 256), dtype=dtype)
+            data[:self.len] = self._data[:self.len]
+            self._data = data
+        self._data[self.len: self.len + len(values)] = values
+        self.len += len(values)
+
+
+class EWM:
+    """ incremental exponentially weighted mean, O(new values) per update
+    equivalent to pd.Series(values).ewm(span=span).mean(), nan values are skipped
+    >>> ema = EWM(50)
+    >>> ema.update(new_values)  # returns ewm of new values, ema.values: all ewm values
+    """
+    def __init__(self, span: float):
+        self.span = span
+        self._decay = 1. - 2. / (span + 1.)
+        self._num = 0.
+        self._den = 0.
+        self._values = _Buffer()
+
+    @property
+    def values(self) -> np.ndarray:
+        """ ewm of all values updated"""
+        return self._values.values
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        """ update with new values"""
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        if not len(values):
+            return values
+        valid = ~np.isnan(values)
+        num, _ = lfilter([1.], [1., -self._decay], np.where(valid, values, 0.),
+                         zi=[self._decay * self._num])
+        den, _ = lfilter([1.], [1., -self._decay], valid.astype(np.float64),
+                         zi=[self._decay * self._den])
+        self._num = num[-1]
+        self._den = den[-1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = np.where(den > 0, num / den, np.nan)
+        self._values.extend(out)
+        return out
+
+
+class LogTail:
+    """ incremental log reader, parses only rows appended since the last read
+    follows csv segments written by PLog(buffer=N), or NpyLog folders
+    >>> tail = LogTail("train.csv", columns=["Loss"])
+    >>> new = tail.read()       # DataFrame of new rows
+    >>> loss = tail["Loss"]     # ndarray, all rows read so far
+    """
+    def __init__(self, name: str, columns: Optional[list] = None):
+        self.name = osp.abspath(osp.expanduser(name))
+        self.columns = columns
+        self.len = 0
+        self._data = {}
+        self._segment = 0
+        self._offset = 0    # bytes read in current segment, or rows for NpyLog
+        self._header = b""
+        self._rows = 0      # rows read in current csv segment
+        self._store = None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self._data[key].values
+
+    def keys(self) -> list:
+        """ columns read"""
+        return list(self._data.keys())
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """ DataFrame of all rows read, copied"""
+        return pd.DataFrame({key: val.values for key, val in self._data.items()})
+
+    def read(self) -> pd.DataFrame:
+        """ parse rows appended since last read"""
+        if self._store is None and NpyLog.exists(self.name):
+            self._store = NpyLog(self.name)
+        new = self._read_npy() if self._store is not None else self._read_csv()
+        for key in new:
+            if key not in self._data:
+                self._data[key] = _Buffer()
+                self._data[key].extend(np.full(self.len, np.nan))
+            self._data[key].extend(new[key].to_numpy())
+        self.len += len(new)
+        for key, val in self._data.items():
+            if val.len < self.len:
+                val.extend(np.full(self.len - val.len, np.nan))
+        return new
+
+    def _read_npy(self) -> pd.DataFrame:
+        self._store.refresh()
+        columns = [key for key in self._store.columns
+                   if self.columns is None or key in self.columns]
+        new = pd.DataFrame({key: np.array(self._store.column(key)[self._offset:])
+                            for key in columns})
+        self._offset = self._store.len
+        return new
+
+    def _read_csv(self) -> pd.DataFrame:
+        usecols = None if self.columns is None else lambda col: col in self.columns
+        segments = log_segments(self.name)
+        chunks = []
+        skip = 0
+        while self._segment < len(segments):
+            with open(segments[self._segment], 'rb') as _fi:
+                if self._header and self._rewritten(_fi):
+                    # unbuffered PLog.extend_keys() rewrites the segment with a wider header
+                    skip, self._rows, self._offset, self._header = self._rows, 0, 0, b""
+                _fi.seek(self._offset)
+                chunk = _fi.read()
+            chunk = chunk[:chunk.rfind(b"\n") + 1] # complete lines only
+            self._offset += len(chunk)
+            if not self._header:
+                self._header, _, chunk = chunk.partition(b"\n")
+                self._header += b"\n"
+            if chunk:
+                frame = pd.read_csv(io.BytesIO(self._header + chunk), usecols=usecols)
+                self._rows += len(frame)
+                if skip: # rows read before rewrite
+                    frame, skip = frame.iloc[skip:], max(skip - len(frame), 0)
+                chunks.append(frame)
+            if self._segment == len(segments) - 1:
+                break
+            self._segment += 1
+            self._offset = 0
+            self._header = b""
+            self._rows = 0
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True)
+
+    def _rewritten(self, fileobj) -> bool:
+        """ current segment was truncated or its header changed since last read"""
+        if osp.getsize(fileobj.name) < self._offset:
+            return True
+        return fileobj.read(len(self._header)) != self._header
+
+
 # pylint: disable=unsubscriptable-object
 # pylint: disable=no-member
 class PLog:
@@ -118,12 +418,22 @@ class PLog:
         log.collect(Iter=120)
         ...
         log.write() # write flushes .frame
+
+    # buffered: keeps file open, writes every 100 rows or 10 seconds, and on exit
+        log = PLog(name, buffer=100, flush_secs=10)
+        new columns start a new csv segment '<root>.<n>.csv' instead of rewriting the log
+
+    # columnar: stores numeric columns to NpyLog folder '<root>.npylog'
+        log = PLog(name, backend='npy', buffer=100)
     """
     def __init__(self, name, **kwargs):
         """ init reads csv if exists
         Args
             name     (str) csvfile
             iloc        (int[-1]) returns location as frame
+            buffer      (int [0]) if > 0, rows kept in memory before writing
+            flush_secs  (float [10]) if buffer, max seconds between writes
+            backend     (str ['csv']) | 'npy': NpyLog folder '<root>.npylog'
 
         """
         self.name = osp.abspath(osp.expanduser(name))
@@ -135,7 +445,22 @@ class PLog:
         self._log_interval = kwargs.get("log_interval", -1)
         self._end = kwargs.get("end", {"end":"\r"} )
         self._allow_missing = kwargs.get("allow_missing", True)
+
+        self._file = self.name  # current segment
+        self._buffer = kwargs.get("buffer", 0)
+        self._flush_secs = kwargs.get("flush_secs", 10)
+        self._rows = []
+        self._flushed = time.time()
+        self._fo = None
+        self._writer = None
+        self._store = None
+        if kwargs.get("backend", "csv") == "npy":
+            self._store = NpyLog(osp.splitext(self.name)[0] + ".npylog")
+        if self._buffer:
+            atexit.register(self.close)
+
         self.data = None
+        self._tail = None
         self.read(iloc=kwargs.get('iloc', -1), init=kwargs.get('init', True))
 
     def read(self, iloc=-1, init=False):
@@ -143,11 +468,18 @@ class PLog:
         Args
             iloc: fills self.values with dfl.iloc[iloc]
         """
-        if not osp.isfile(self.name):
-            os.makedirs(osp.split(self.name)[0], exist_ok=True)
-            return None
-
-        self.data = pd.read_csv(self.name)
+        self.flush()
+        if self._store is not None:
+            if not NpyLog.exists(self._store.folder):
+                return None
+            self.data = self._store.read()
+        else:
+            segments = log_segments(self.name)
+            if not segments:
+                os.makedirs(osp.split(self.name)[0], exist_ok=True)
+                return None
+            self._file = segments[-1]
+            self.data = read_log(self.name)
         self.len = len(self.data)
         self.columns = list(self.data.columns)
         if len(self.data) > abs(iloc):
@@ -160,10 +492,15 @@ class PLog:
         """
         *args 
         """
-        if read:
-            self.read()
-        _args = [arg for arg in args if arg in self.data]
-        assert len(_args), f"{args} not in {self.data.keys()}"
+        data = self.data
+        if read: # parse only rows written since last plot(read=True)
+            self.flush()
+            if self._tail is None:
+                self._tail = LogTail(self.name if self._store is None else self._store.folder)
+            self._tail.read()
+            data = self._tail
+        _args = [arg for arg in args if arg in data]
+        assert len(_args), f"{args} not in {data.keys()}"
 
         fro = kwargs.get("fro", 0)
         to = kwargs.get("to", None)
@@ -181,11 +518,11 @@ class PLog:
         if grid:
             ax.grid()
         for arg in _args:
-            if arg in self.data:
+            if arg in data:
                 kw = {}
                 if labels:
                     kw['label'] = arg
-                ax.plot(self.data[arg][fro:to], **kw)
+                ax.plot(data[arg][fro:to], **kw)
         if 'xlabel' in kwargs:
             ax.xlabel(kwargs['xlabel'])
         if 'ylabel' in kwargs:
@@ -199,19 +536,72 @@ class PLog:
     def extend_keys(self, new_keys):
         """ adds new nan values for all rows of new keys
             overwrites stored file with new with kesy
+            if buffered, starts a new segment with the new keys instead
         """
-        self.read()
+        new_keys = [key for key in new_keys if key not in (self.columns or [])]
+        if self._store is not None: # NpyLog adds columns on append
+            self.flush()
+            self.columns = (self.columns or []) + new_keys
+            return
+        if self._buffer:
+            self._roll(new_keys)
+            return
+        self.flush()
+        if not osp.isfile(self._file):
+            self.columns = (self.columns or []) + new_keys
+            return
+        data = pd.read_csv(self._file)
         for key in new_keys:
-            if key not in self.data:
-                self.data[key] = [np.nan for i in range(self.len)]
-        self.columns = list(self.data.columns)
-        self.data.to_csv(self.name, index=False)
+            if key not in data:
+                data[key] = [np.nan for i in range(len(data))]
+        self.columns = list(data.columns)
+        data.to_csv(self._file, index=False)
+
+    def _roll(self, new_keys):
+        """ buffered logs: close current segment and continue on a new one with new keys"""
+        self.close()
+        if osp.isfile(self._file) and osp.getsize(self._file):
+            segments = log_segments(self.name)
+            self._file = _segment_name(self.name, len(segments))
+        self.columns = (self.columns or []) + new_keys
+
+    def flush(self):
+        """ write buffered rows to current segment"""
+        if not self._rows:
+            return
+        if self._store is not None:
+            self._store.append({col: [row[i] for row in self._rows]
+                                for i, col in enumerate(self.columns)})
+            self._rows = []
+            self._flushed = time.time()
+            return
+        if self._fo is None:
+            _new = not osp.isfile(self._file) or not osp.getsize(self._file)
+            self._fo = open(self._file, 'a', encoding='utf8', newline='')
+            self._writer = csv.writer(self._fo)
+            if _new:
+                self._writer.writerow(self.columns)
+                print("logging file created:", self._file)
+        self._writer.writerows([['' if isinstance(val, float) and val != val else val
+                                 for val in row] for row in self._rows])
+        self._fo.flush()
+        self._rows = []
+        self._flushed = time.time()
+
+    def close(self):
+        """ flush buffered rows and close file"""
+        self.flush()
+        if self._fo is not None:
+            self._fo.close()
+            self._fo = None
+            self._writer = None
 
     def _check_for_armaggeddon(self, **values):
         if self.columns is not None:
             _bad = [key for key in values if key not in self.columns]
             if self._allow_missing:
-                self.extend_keys(_bad)
+                if _bad:
+                    self.extend_keys(_bad)
             else:
                 assert not _bad, f"keys {_bad} not in columns {self.columns}, \
                     to add new key run, self.extend_keys({_bad})\n{Col.RB}{self.name}{Col.AU}"
@@ -260,17 +650,24 @@ class PLog:
         self.collect(new_frame=new_frame, **values)
         self._fix_columns()
 
-        #assert check file has been created
-        _check_creation = not osp.isfile(self.name)
+        if self._buffer:
+            self._rows.extend(zip(*self.frame.values()))
+            if (len(self._rows) >= self._buffer or
+                    time.time() - self._flushed > self._flush_secs):
+                self.flush()
+        elif self._store is not None:
+            self._store.append(self.frame)
+        else:
+            #assert check file has been created
+            _check_creation = not osp.isfile(self._file)
 
-        # write to csv
-        dfl = pd.DataFrame(self.frame)
-        dfl.to_csv(self.name, index=False, mode='a',
-                   header=not osp.isfile(self.name))
+            # write to csv
+            dfl = pd.DataFrame(self.frame)
+            dfl.to_csv(self._file, index=False, mode='a', header=_check_creation)
 
-        if _check_creation:
-            assert osp.isfile(self.name), f"could not write file: {self.name}"
-            print("logging file created:", self.name)
+            if _check_creation:
+                assert osp.isfile(self._file), f"could not write file: {self._file}"
+                print("logging file created:", self._file)
 
         # cleanup
         self.len += 1
@@ -287,7 +684,7 @@ class PLog:
             print(msg, **self._end)
 
 
-## TODO: move to PLOG, generalize, selfupdating
+## TODO: move to PLOG, generalize
 def plotlog(logname: str,
             column: str = "Loss",
             figsize: tuple = (10,5),
@@ -298,11 +695,12 @@ def plotlog(logname: str,
             to: Optional[int] = None,
             ylog: bool = True,
             ytick: Union[None, tuple, list] = None,
-            ema_window: Union[int, tuple] = 50) -> None:
+            ema_window: Union[int, tuple] = 50,
+            follow: float = 0) -> None:
     """ plots column [Loss] from csv file
     if column 'Epoch' exists, ticks them
     Args
-        logname     (str) csv. file
+        logname     (str) csv. file or NpyLog folder
         column      (str ['Loss']) column to plot
         figsize     (tuple [(10,5)])
         title       (str [None])  add title to plot
@@ -313,32 +711,75 @@ def plotlog(logname: str,
         ylog        (bool [True]) -> plt.yscale='log'
         ytick       (tuple, list [None]) add ticks
         ema_window  (int|tuple [50]) size(s) of averaging window
+        follow      (float [0]) if > 0, redraw every 'follow' seconds until figure is closed
+            only rows appended since last redraw are read and averaged
 
     TODO: search for columns lowercase
     TODO: add multiple logs
     TODO: add stepped loss per epoch - from aubgment
     """
     logname = osp.abspath(osp.expanduser(logname))
-    assert osp.isfile(logname), f"log file {logname} not found"
-    _maxtick = 21
+    assert osp.isfile(logname) or NpyLog.exists(logname), f"log file {logname} not found"
 
-    df = pd.read_csv(logname)
+    tail = LogTail(logname, columns=[column, "Epoch", "Total_Time"])
+    tail.read()
+    assert column in tail, f"column {column} not found in {tail.keys()}"
 
-    assert column in df, f"column {column} not found in {list(df.columns)}"
-
-
-    if figsize is not None:
-        plt.figure(figsize=figsize)
-    if title is not None:
-        plt.title(title)
-    y = np.asarray(df[column])
-    ema = None
     if isinstance(ema_window, int) and ema_window:
         ema_window = (ema_window,)
-
+    ema = None
     if isinstance(ema_window, tuple):
-        ema = [np.asarray(df[column].ewm(span=w).mean()) for w in ema_window]
+        ema = [EWM(w) for w in ema_window]
+        for e in ema:
+            e.update(tail[column])
 
+    _info = ""
+    folder = osp.split(logname)[0]
+    ymls = [f.path for f in os.scandir(folder) if f.name.endswith(".yml")]
+    if ymls:
+        _meta = ObjDict()
+        _meta.from_yaml(ymls[0])
+
+        for k in ['lr', 'strategy']:
+            if k in _meta:
+                _info += f"\n{k}: {_meta[k]}"
+        if "data_path" in _meta:
+            _info += f"\n{osp.basename(_meta['data_path'])}"
+
+    fig = plt.figure(figsize=figsize) if figsize is not None else plt.gcf()
+    while True:
+        if title is not None:
+            plt.title(title)
+        _plotlog(tail, column, ema, _info, label, fro, to, ylog, ytick)
+        if not follow:
+            break
+        try:
+            plt.pause(follow)
+        except KeyboardInterrupt:
+            return
+        if not plt.fignum_exists(fig.number):
+            return
+        new = tail.read()
+        if ema is not None and column in new:
+            for e in ema:
+                e.update(new[column])
+        plt.clf()
+
+    if show:
+        plt.show()
+
+def _plotlog(tail: LogTail,
+             column: str,
+             ema: Optional[list],
+             info: str,
+             label: Optional[str],
+             fro: int,
+             to: Optional[int],
+             ylog: bool,
+             ytick: Union[None, tuple, list]) -> None:
+    """ draws current state of plotlog()"""
+    _maxtick = 21
+    y = tail[column]
 
     to = to or len(y)
     to = to%(len(y)+1)
@@ -347,7 +788,8 @@ def plotlog(logname: str,
         fro = 0
     y = y[fro:to]
     if ema is not None:
-        ema = [e[fro:to] for e in ema]
+        ema_window = [e.span for e in ema]
+        ema = [e.values[fro:to] for e in ema]
 
     mins = []
     kwargs = {}
@@ -370,21 +812,10 @@ def plotlog(logname: str,
             plt.plot(e, **kwargs)
             mins.append(sround(e.min()))
 
-    _info = f"Iters {len(df)}"
-    if "Total_Time" in df:
-        _info += f"\nTime {str(datetime.timedelta(seconds=int(df.Total_Time.iloc[-1])))}"
-
-    folder = osp.split(logname)[0]
-    ymls = [f.path for f in os.scandir(folder) if f.name.endswith(".yml")]
-    if ymls:
-        _meta = ObjDict()
-        _meta.from_yaml(ymls[0])
-
-        for k in ['lr', 'strategy']:
-            if k in _meta:
-                _info += f"\n{k}: {_meta[k]}"
-        if "data_path" in _meta:
-            _info += f"\n{osp.basename(_meta['data_path'])}"
+    _info = f"Iters {tail.len}"
+    if "Total_Time" in tail:
+        _info += f"\nTime {str(datetime.timedelta(seconds=int(tail['Total_Time'][-1])))}"
+    _info += info
 
     plt.scatter(0,0, s=1, label=_info)
 
@@ -395,17 +826,17 @@ def plotlog(logname: str,
 
     plt.grid()
 
-    if "Epoch" in df:
-        _epoch = df.Epoch
+    if "Epoch" in tail:
+        _epoch = tail["Epoch"]
         if fro > 0 or to is not None:
-            _epoch = _epoch.iloc[fro:to]
+            _epoch = _epoch[fro:to]
 
         epochs = np.unique(_epoch)
         print(epochs[0], epochs[-1])
         if len(epochs) > _maxtick:
             epochs = epochs[ np.linspace(0, epochs[-1]-epochs[0], _maxtick).astype(np.int64)]
 
-        xlabels = [df.index[df.Epoch == e].values[0] for e in epochs]
+        xlabels = [np.argmax(tail["Epoch"] == e) for e in epochs]
         rotation = 0 if len(str(xlabels[-1])) < 3 else 45
         plt.xticks(xlabels, epochs+1-fro, rotation=rotation)
         plt.xlabel("Epochs")
@@ -434,22 +865,19 @@ def plotlog(logname: str,
     if "label" in kwargs:
         plt.legend()
 
-    if show:
-        plt.show()
-
 def _parseargs(args):
     name = "train.csv"
     col = "Loss"
     if not args:
         name = osp.join(os.getcwd(), name)
     else:
-        if osp.isfile(args[0]):
+        if osp.isfile(args[0]) or NpyLog.exists(args[0]):
             name = args[0]
         elif osp.isdir(args[0]):
             name = osp.join(args[0], name)
         if len(args) > 1:
             col = args[1]
-    assert osp.isfile(name), f" file {name} not found"
+    assert osp.isfile(name) or NpyLog.exists(name), f" file {name} not found"
     return name, col
 
 
@@ -4,12 +4,18 @@ point utilities
 outlier methods
 irq_keep()      keep points < 75% of distance
 zscore_keep()   keep points < 3 stds of distance
+
+spatial index
+VoxelGrid()     uniform grid hash, radius and k nearest neighbour queries
 """
 from typing import Union, Tuple, Optional
 import numpy as np
 import torch
+from .grids import mgrid
 Vector = Union[torch.Tensor, np.ndarray]
 
+# pylint: disable=no-member
+
 
 def sort_points_by_distance(points: Vector,
                             center: Optional[Vector] = None) -> Tuple[Vector, Vector]:
@@ -59,3 +65,143 @@ def irq_keep(dists: Vector,
     clip_far = (dists < upper_bound) if clip_far else True
     clip_near = (dists > lower_bound) if clip_near else True
     return _op.where(clip_far & clip_near)[0]
+
+
+class VoxelGrid:
+    """ uniform grid spatial index: points sorted by linear key of integer cell coordinates
+    radius and knn queries only measure distances to points in neighbouring cells,
+    near linear in number of points for well distributed clouds; results are exact,
+    queries with no neighbours within a few rings fall back to brute force.
+    Examples
+    >>> grid = VoxelGrid(points)                # Tensor (N, C)
+    >>> dists, idcs = grid.knn(points, k=8)     # squared distances, first neighbour is self
+    >>> idcs, dists = grid.radius(query, 0.05)  # (M, 2) [query index, point index] pairs
+    Args
+        points      (Tensor) shape(N, C)
+        cell_size   (float [None]) None: estimated for ~per_cell points per occupied cell
+        per_cell    (int [4])
+    """
+    def __init__(self, points: torch.Tensor, cell_size: Optional[float] = None,
+                 per_cell: int = 4):
+        self.points = points
+        self.low = points.min(dim=0)[0]
+        extent = points.max(dim=0)[0] - self.low
+        if cell_size is None:
+            # start from a uniformly filled bounding box, rescale by occupied cells
+            _extent = extent[extent > 0]
+            _ndim = max(len(_extent), 1)
+            volume = _extent.double().prod().item() if len(_extent) else 1.
+            cell_size = (volume * per_cell / len(points))**(1/_ndim)
+            for _ in range(3):
+                self._set_cells(extent, cell_size)
+                _per_cell = len(points) / len(self.cell_keys)
+                cell_size *= (per_cell / _per_cell)**(1/_ndim)
+        self._set_cells(extent, cell_size)
+
+    def _set_cells(self, extent: torch.Tensor, cell_size: float):
+        self.cell_size = cell_size
+        self.dims = (extent / cell_size).long() + 1
+        self.keys, self.order = self._keys(self._cells(self.points)).sort()
+        self.cell_keys, self.counts = torch.unique_consecutive(self.keys, return_counts=True)
+        self.starts = self.counts.cumsum(0) - self.counts
+
+    def _cells(self, points: torch.Tensor) -> torch.Tensor:
+        return ((points - self.low) / self.cell_size).floor().long()
+
+    def _keys(self, cells: torch.Tensor) -> torch.Tensor:
+        keys = cells[..., 0].clone()
+        for i in range(1, cells.shape[-1]):
+            keys.mul_(self.dims[i]).add_(cells[..., i])
+        return keys
+
+    def _candidates(self, query: torch.Tensor, ring: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        """ (query index, point index) for points in cells up to 'ring' cells away from query"""
+        channels = query.shape[-1]
+        offsets = mgrid([2*ring + 1]*channels, dtype=torch.int64, shift=-ring).view(-1, channels)
+        cells = self._cells(query)[:, None] + offsets.to(device=query.device)
+        valid = ((cells >= 0) & (cells < self.dims)).all(dim=-1)
+        keys = self._keys(cells)
+        pos = torch.searchsorted(self.cell_keys, keys).clamp_(max=len(self.cell_keys) - 1)
+        counts = torch.where(valid & (self.cell_keys[pos] == keys), self.counts[pos], 0)
+        counts = counts.view(-1)
+        offset = self.starts[pos].view(-1) - (counts.cumsum(0) - counts)
+        idx = torch.repeat_interleave(offset, counts)
+        idx += torch.arange(len(idx), device=idx.device)
+        qidx = torch.repeat_interleave(torch.arange(len(query), device=query.device),
+                                       counts.view(len(query), -1).sum(dim=1))
+        return qidx, self.order[idx]
+
+    def radius(self, query: torch.Tensor, radius: float,
+               chunk: int = 4096) -> Tuple[torch.Tensor, torch.Tensor]:
+        """ all points within radius of query points
+        Returns (indices (M, 2) [query index, point index], squared distances (M))
+        Args
+            query   (Tensor) shape(Q, C)
+            radius  (float)
+            chunk   (int [4096]) queries per pass
+        """
+        ring = max(int(np.ceil(radius / self.cell_size)), 1)
+        idcs, dists = [], []
+        for i, _query in enumerate(query.split(chunk)):
+            qidx, pidx = self._candidates(_query, ring)
+            dist = ((_query[qidx] - self.points[pidx])**2).sum(dim=-1)
+            keep = dist <= radius**2
+            idcs.append(torch.stack((qidx[keep] + i * chunk, pidx[keep]), dim=1))
+            dists.append(dist[keep])
+        return torch.cat(idcs), torch.cat(dists)
+
+    def knn(self, query: torch.Tensor, k: int = 10, chunk: int = 4096,
+            max_ring: int = 4) -> Tuple[torch.Tensor, torch.Tensor]:
+        """ k nearest neighbours, exact: search rings are widened for queries whose
+        k-th neighbour could lie beyond the cells searched, queries unresolved past max_ring,
+        isolated or far outside the grid, are solved by tiled brute force knn()
+        Returns (squared distances, indices) shape (Q, k), sorted by distance
+        Args
+            query       (Tensor) shape(Q, C)
+            k           (int [10])
+            chunk       (int [4096]) queries per pass at ring 1, reduced for wider rings
+            max_ring    (int [4]) widest ring searched, (2*max_ring+1)^C cells per query
+        """
+        k = min(k, len(self.points))
+        channels = query.shape[-1]
+        dists = query.new_full((len(query), k), float("inf"))
+        idcs = torch.full((len(query), k), -1, dtype=torch.int64, device=query.device)
+        pending = torch.arange(len(query), device=query.device)
+        ring = 1
+        while len(pending) and ring <= max_ring:
+            _pending = []
+            # constant number of candidate cells per pass
+            _chunk = max(1, chunk * 3**channels // (2*ring + 1)**channels)
+            for _idx in pending.split(_chunk):
+                qidx, pidx = self._candidates(query[_idx], ring)
+                dist = ((query[_idx[qidx]] - self.points[pidx])**2).sum(dim=-1)
+                # scatter candidates to dense (queries, max candidates) to select top k
+                num = torch.bincount(qidx, minlength=len(_idx))
+                width = max(num.max().item() if len(num) else 0, k)
+                col = torch.arange(len(qidx), device=qidx.device)
+                col += torch.repeat_interleave(qidx.new_tensor(width) * torch.arange(
+                    len(_idx), device=qidx.device) - (num.cumsum(0) - num), num)
+                _dists = query.new_full((len(_idx), width), float("inf"))
+                _dists.view(-1)[col] = dist
+                _pidx = torch.full(_dists.shape, -1, dtype=torch.int64, device=query.device)
+                _pidx.view(-1)[col] = pidx
+                _dists, _sel = _dists.topk(k, dim=1, largest=False)
+                _pidx = _pidx.gather(1, _sel)
+
+                # searched cells cover at least ring cells plus distance to own cell border
+                _pos = (query[_idx] - self.low) / self.cell_size
+                _cells = _pos.floor()
+                _pos = _pos - _cells
+                margin = torch.minimum(_pos, 1 - _pos).min(dim=1)[0].add_(ring)
+                done = _dists[:, -1] <= (margin * self.cell_size)**2
+                # or searched cells contain the whole grid
+                done |= ((_cells - ring <= 0) & (_cells + ring >= self.dims - 1)).all(dim=1)
+                dists[_idx[done]] = _dists[done]
+                idcs[_idx[done]] = _pidx[done]
+                _pending.append(_idx[~done])
+            pending = torch.cat(_pending)
+            ring *= 2
+        if len(pending):
+            from .transformations import knn # pylint: disable=import-outside-toplevel
+            dists[pending], idcs[pending] = knn(query[pending], self.points, k=k)
+        return dists, idcs
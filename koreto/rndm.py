@@ -67,17 +67,21 @@ def unique_randint(low, high, size, overflow=1.2, out_type="torch"):
     Args
         low         (int)
         high        (int)
-        size        (int) < high - low
+        size        (int) <= high - low
         overflow    (float [1.2]) > 1
 
         out_type    (str ["torch"]) | "numpy"
+    sizes over half the range are drawn from a permutation
     """
-    assert size < high - low, "size needs to be smaller than range"
+    assert size <= high - low, "size needs to be at most range"
     assert overflow > 1
     if not WITH_TORCH:
         out_type = "numpy"
     if out_type[0] == "n":
-        return _np_unique_randint(low, high, size, overflow=1.2)
+        return _np_unique_randint(low, high, size, overflow=overflow)
+
+    if 2 * size > high - low:
+        return torch.randperm(high - low)[:size].sort()[0].add_(low)
 
     samples = torch.unique(torch.randint(low, high, (int(size*overflow),)))
     num_samples = len(samples)
@@ -88,8 +92,8 @@ def unique_randint(low, high, size, overflow=1.2, out_type="torch"):
     if not excess:
         return samples
 
-    _i = torch.randint(0, size-excess, (1,))
-    return torch.cat([samples[0:_i], samples[_i +excess:]])
+    # drop random samples, keep sorted
+    return samples[torch.randperm(num_samples)[:size].sort()[0]]
 
 
 def _np_unique_randint(low, high, size, overflow=1.2):
@@ -97,9 +101,12 @@ def _np_unique_randint(low, high, size, overflow=1.2):
     Args
         low         (int)
         high        (int)
-        size        (int) < high - low
+        size        (int) <= high - low
         overflow    (float [1.2]) > 1
     """
+    if 2 * size > high - low:
+        return np.sort(np.random.permutation(high - low)[:size]) + low
+
     samples = np.unique(np.random.randint(low, high, int(size*overflow)))
     num_samples = len(samples)
     if num_samples < size:
@@ -109,5 +116,5 @@ def _np_unique_randint(low, high, size, overflow=1.2):
     if not excess:
         return samples
 
-    i = np.random.randint(0, size-excess)
-    return np.concatenate([samples[0:i], samples[i+excess:]])
+    # drop random samples, keep sorted
+    return samples[np.sort(np.random.permutation(num_samples)[:size])]
@@ -1,44 +1,96 @@
 """
 numpy / torch transformations with inputs of shapes [..., C]
 """
-from typing import Union
-import math
+from typing import Union, Optional, Tuple
 import numpy as np
 import torch
+from .points import VoxelGrid
 Vector = Union[np.ndarray, torch.Tensor]
 
 # pylint: disable=no-member
 # pylint: disable=not-callable
 
-def mean_dist(p, size=1024, k=3):
-    """ KISS method to find mean distance to closest points
-    No good if too many points.
+def knn(query: torch.Tensor,
+        reference: Optional[torch.Tensor] = None,
+        k: int = 10,
+        query_size: int = 1024,
+        ref_size: int = 16384,
+        grid: bool = False) -> Tuple[torch.Tensor, torch.Tensor]:
+    """ k nearest neighbours, brute force over tiles keeping a running top k
+    memory is bounded by query_size * ref_size distances, not len(query) * len(reference)
+    Returns (squared distances, indices) shape (Q, k), sorted by distance
+    Args
+        query       (Tensor) shape(Q, C)
+        reference   (Tensor [None]) shape(N, C), None: query, nearest neighbour is the point itself
+        k           (int [10])
+        query_size  (int [1024]) query points per tile
+        ref_size    (int [16384]) reference points per tile
+        grid        (bool [False]) if True search neighbouring cells of a VoxelGrid index
+            instead of all points, near linear time, for large clouds
+    """
+    reference = query if reference is None else reference
+    if grid:
+        return VoxelGrid(reference).knn(query, k=k, chunk=query_size)
+    k = min(k, len(reference))
+    # center to reduce cancellation in |q|² + |r|² - 2q.r
+    center = reference.mean(dim=0)
+    reference = reference - center
+    ref_sq = [(ref**2).sum(dim=-1) for ref in reference.split(ref_size)]
+
+    dists, idcs = [], []
+    for q in (query - center).split(query_size):
+        q_sq = (q**2).sum(dim=-1, keepdim=True)
+        best_d = q.new_empty(len(q), 0)
+        best_i = torch.empty(len(q), 0, dtype=torch.int64, device=q.device)
+        for j, ref in enumerate(reference.split(ref_size)):
+            _d = torch.addmm(ref_sq[j], q, ref.T, alpha=-2).add_(q_sq).clamp_(min=0)
+            _d, _i = _d.topk(min(k, _d.shape[1]), dim=1, largest=False)
+            best_d = torch.cat((best_d, _d), dim=1)
+            best_i = torch.cat((best_i, _i.add_(j * ref_size)), dim=1)
+            best_d, _sel = best_d.topk(min(k, best_d.shape[1]), dim=1, largest=False)
+            best_i = best_i.gather(1, _sel)
+        # exact distances of selected neighbours
+        best_d, _sel = ((q[:, None] - reference[best_i])**2).sum(dim=-1).sort(dim=1)
+        dists.append(best_d)
+        idcs.append(best_i.gather(1, _sel))
+    return torch.cat(dists), torch.cat(idcs)
+
+
+def mean_dist(p, size=1024, k=3, grid=False):
+    """ mean squared distance to k closest points
+    Args
+        p       (Tensor) shape(N, C)
+        size    (int [1024]) query points per tile, see knn()
+        k       (int [3])
+        grid    (bool [False]) use VoxelGrid index, see knn()
     """
-    N, C = p.shape
-    steps = math.ceil(N/size)
-    j = dict(axis=-1)
-    return torch.cat([
-        ((p[i*size: (i+1)*size][:, None] - p)**2).sum(**j).sort(**j)[0][:, 1:k+1].mean(**j)
-         for i in range(steps)
-    ])
-
-def estimate_points_normals(points: torch.Tensor, k: int = 10) -> torch.Tensor:
-    """ estimate point normals on local point cloud 
-    No good if 4 * len(points)**2 > torch.cuda.get_device_properties(0).total_memory 
+    return knn(p, k=k + 1, query_size=size, grid=grid)[0][:, 1:].mean(dim=-1)
+
+def estimate_points_normals(points: torch.Tensor,
+                            k: int = 10,
+                            size: int = 1024,
+                            grid: bool = False,
+                            method: str = "eig") -> torch.Tensor:
+    """ estimate point normals on local point cloud
     Args
         points  (Tensor) shape(N, 3)
         k       (int [10])
+        size    (int [1024]) query points per tile, see knn()
+        grid    (bool [False]) use VoxelGrid index, see knn()
+        method  (str ['eig']) | 'svd', see fit_plane_normal()
     """
-    _, idcs = torch.cdist(points, points).topk(k + 1, largest=False)
-    return fit_plane_normal(points[idcs[:, 1:]]) # [N, k, 3]
+    _, idcs = knn(points, k=k + 1, query_size=size, grid=grid)
+    return fit_plane_normal(points[idcs[:, 1:]], method=method) # [N, k, 3]
 
 
-def fit_plane_normal(points: Vector) -> Vector:
+def fit_plane_normal(points: Vector, method: str = "svd") -> Vector:
     """Fit a plane to the points and return normal or normals
 
     Args
         points  ndarray or tensor shape(..., N, 3)
             if ndim == 3, computes multiple normals
+        method  (str ['svd']) | 'eig': eigen vector of smallest eigen value of 3x3 covariance,
+            closed form, batched; faster than svd for many small neighbourhoods
 
     Could be done with leastsq  or eigen vectors
     Faster than eigen vectors
@@ -47,11 +99,79 @@ def fit_plane_normal(points: Vector) -> Vector:
         eigvals, eigvecs  = torch.linalg.eigh(cov_matrix, UPLO='U')
         return eigvecs[:, 0]
     """
+    points = points - points.mean(axis=-2, keepdims=True)
+    if method == "eig":
+        _op = torch if torch.is_tensor(points) else np
+        return min_eigen_vector3(_op.einsum('...ni,...nj->...ij', points, points))
     linalg = torch.linalg if torch.is_tensor(points) else np.linalg
-    _, _, vh = linalg.svd(points - points.mean(axis=-2, keepdim=True))
+    _, _, vh = linalg.svd(points)
     return vh[..., 2, :]
 
 
+def min_eigen_vector3(cov: Vector) -> Vector:
+    """ unit eigen vector of smallest eigen value of symmetric 3x3 matrices, closed form
+    eigen values from trigonometric solution of characteristic polynomial,
+    eigen vector from largest cross product of rows of (cov - λ I)
+    Args
+        cov     ndarray or tensor shape(..., 3, 3) symmetric
+    """
+    _op = torch if torch.is_tensor(cov) else np
+    # scale to unit max to condition
+    scale = abs(cov).reshape(*cov.shape[:-2], 9).max(axis=-1)
+    scale = getattr(scale, "values", scale) # torch returns (values, indices)
+    cov = cov / _op.where(scale > 0, scale, 1)[..., None, None]
+
+    a00, a11, a22 = cov[..., 0, 0], cov[..., 1, 1], cov[..., 2, 2]
+    a01, a02, a12 = cov[..., 0, 1], cov[..., 0, 2], cov[..., 1, 2]
+    q = (a00 + a11 + a22) / 3
+    b00, b11, b22 = a00 - q, a11 - q, a22 - q
+    p = _op.sqrt((b00**2 + b11**2 + b22**2 + 2 * (a01**2 + a02**2 + a12**2)) / 6)
+    _p = _op.where(p > 0, p, 1)
+    det = (b00 * (b11 * b22 - a12**2) - a01 * (a01 * b22 - a12 * a02) +
+           a02 * (a01 * a12 - b11 * a02)) / _p**3
+    phi = _op.arccos(_op.clip(det / 2, -1, 1)) / 3
+    eigen_val = q + 2 * p * _op.cos(phi + 2 * np.pi / 3)
+
+    rows = cov - eigen_val[..., None, None] * _op.eye(3, dtype=cov.dtype, **(
+        {"device": cov.device} if torch.is_tensor(cov) else {}))
+    r0, r1, r2 = rows[..., 0, :], rows[..., 1, :], rows[..., 2, :]
+    crosses = [_cross(r0, r1), _cross(r0, r2), _cross(r1, r2)]
+    norms = [(c**2).sum(axis=-1, keepdims=True) for c in crosses]
+    out = _op.where(norms[0] >= norms[1], crosses[0], crosses[1])
+    norm = _op.where(norms[0] >= norms[1], norms[0], norms[1])
+    out = _op.where(norm >= norms[2], out, crosses[2])
+    norm = _op.where(norm >= norms[2], norm, norms[2])
+
+    # repeated smallest eigen value, rank(cov - λ I) <= 1, e.g. collinear points:
+    # any vector orthogonal to the largest row, the dominant eigen vector, is an eigen vector
+    row_norms = [(r**2).sum(axis=-1, keepdims=True) for r in (r0, r1, r2)]
+    row = _op.where(row_norms[0] >= row_norms[1], r0, r1)
+    row_norm = _op.where(row_norms[0] >= row_norms[1], row_norms[0], row_norms[1])
+    row = _op.where(row_norm >= row_norms[2], row, r2)
+    row_norm = _op.where(row_norm >= row_norms[2], row_norm, row_norms[2])
+    eps = _op.finfo(cov.dtype).eps * 64
+    degenerate = norm <= (eps * row_norm)**2
+    if degenerate.any():
+        # cross with the axis least aligned to the row, z if rows are all zero
+        axis = abs(row).argmin(axis=-1)
+        axis = _op.where(row_norm[..., 0] > 0, axis, 2)
+        eye = _op.eye(3, dtype=cov.dtype, **({"device": cov.device} if torch.is_tensor(cov)
+                                             else {}))
+        ortho = _cross(row, eye[axis])
+        ortho = _op.where(row_norm > 0, ortho, eye[axis])
+        _norm = (ortho**2).sum(axis=-1, keepdims=True)
+        out = _op.where(degenerate, ortho, out)
+        norm = _op.where(degenerate, _norm, norm)
+    return out / _op.sqrt(_op.where(norm > 0, norm, 1))
+
+
+def _cross(a: Vector, b: Vector) -> Vector:
+    _op = torch if torch.is_tensor(a) else np
+    return _op.stack((a[..., 1] * b[..., 2] - a[..., 2] * b[..., 1],
+                      a[..., 2] * b[..., 0] - a[..., 0] * b[..., 2],
+                      a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]), axis=-1)
+
+
 def rot_from_vectors(v0: np.ndarray, v1: Union[str, np.ndarray]) -> np.ndarray:
     """ 3x3 rotation from 2 vectors
     Args
@@ -6,6 +6,7 @@
     CPUse       thin wrap of psutils
 """
 from typing import TypeVar, Any, Optional, Callable, Union
+import sys
 import inspect
 from copy import deepcopy
 import os
@@ -15,12 +16,16 @@ import json
 import numpy as np
 import yaml
 
-from koreto import WITH_TORCH
-if WITH_TORCH:
-    import torch
-
 _T = TypeVar('_T')
 
+
+def _torch() -> Any:
+    """ torch module if it was already imported, else None
+    torch is not imported here to keep `import koreto.utils` light, if torch was never
+    imported no tensors can exist
+    """
+    return sys.modules.get("torch")
+
 # pylint: disable=no-member
 # pylint: disable=suppressed-message
 # ###
@@ -62,7 +67,8 @@ class DeepClone:
 
         if isinstance(data, (list, tuple)):
             return self.clone_list(data)
-        if WITH_TORCH and isinstance(data, torch.Tensor):
+        torch = _torch()
+        if torch is not None and isinstance(data, torch.Tensor):
             with torch.no_grad():
                 if self._cpu:
                     return data.cpu().clone().detach()
@@ -255,21 +261,24 @@ class ObjDict(dict):
             DOES not check array validity
         """
         dtype =  np.__dict__[dtype]
+        torch = _torch()
         for key in self:
             if isinstance(self[key], (list, tuple)):
                 self[key] = np.asarray(self[key], dtype=dtype)
-            elif WITH_TORCH and isinstance(self[key], torch.Tensor):
+            elif torch is not None and isinstance(self[key], torch.Tensor):
                 self[key] = self[key].cpu().clone().detach().numpy()
 
     def as_torch(self,
-                 dtype: Union[str, torch.dtype, None] = None,
-                 device: Union[str, torch.device, None] = None,
+                 dtype: Union[str, 'torch.dtype', None] = None,
+                 device: Union[str, 'torch.device', None] = None,
                  **kwargs) -> None:
         """ converts all lists and ndarrays to torch tensor
             DOES not check array validity
             DOES not convert dimensionless data
         """
+        from koreto import WITH_TORCH # pylint: disable=import-outside-toplevel
         assert WITH_TORCH, "pytorch not found, install first"
+        import torch
         kwargs = {k:v for k,v in kwargs.items() if k in ['non_blocking', 'copy', 'memory_format']}
         dtype = torch.__dict__[dtype] if isinstance(dtype, str) else dtype
         device = torch.device(device) if isinstance(device, str) else device
@@ -287,8 +296,10 @@ class ObjDict(dict):
         """ converts all tensors and ndarrays to list
         # will fail on dimensionless
         """
+        torch = _torch()
         for key in self:
-            if isinstance(self[key], np.ndarray) or (WITH_TORCH and torch.is_tensor(self[key])):
+            if isinstance(self[key], np.ndarray) or (torch is not None and
+                                                     torch.is_tensor(self[key])):
                 self[key] = self[key].tolist()
     tolist = as_list
 
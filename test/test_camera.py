@@ -0,0 +1,215 @@
+import time
+import torch
+from koreto.grids import mgrid
+from koreto.camera import Camera, UndistortMap, RaySampler, pixels_to_rays, points_to_pixels
+
+
+def _cameras(number, seed=0):
+    torch.manual_seed(seed)
+    return [Camera(center=torch.rand(2) * 10 + 45, focal=torch.rand(2) * 10 + 95,
+                   radial=torch.randn(3) * 0.05, tangential=torch.randn(2) * 0.01,
+                   rotation=torch.linalg.qr(torch.randn(3, 3))[0], height=100, width=100)
+            for _ in range(number)]
+
+def test_camera_keyvalues():
+    cam = Camera(center=torch.tensor([3., 4.]), height=120, k3=0.1)
+    assert cam.center.tolist() == [3., 4.] and cam.height == 120 and cam.radial[2] == 0.1
+
+def test_pixels_to_rays_batched():
+    cameras = _cameras(256)
+    pixels = torch.rand(len(cameras), 256, 2) * 100
+    _start = time.time()
+    loop = torch.stack([cam.rays(pix) for cam, pix in zip(cameras, pixels)])
+    _loop = time.time() - _start
+    batch = Camera.stack(cameras)
+    _start = time.time()
+    rays = batch.rays(pixels)
+    _batch = time.time() - _start
+    print(f"\npixels_to_rays {tuple(pixels.shape)} loop {_loop*1e3:.1f}ms batch {_batch*1e3:.1f}ms")
+    assert rays.shape == (256, 256, 3)
+    assert torch.allclose(rays, loop, atol=1e-6)
+
+    # one camera per pixel
+    index = torch.randint(0, len(cameras), (1000,))
+    assert torch.allclose(batch[index].rays(pixels[index, 0]), loop[index, 0], atol=1e-6)
+    # image grid per camera
+    grid = pixels[:4, :12].view(4, 3, 4, 2)
+    assert torch.allclose(batch[:4].rays(grid), loop[:4, :12].view(4, 3, 4, 3), atol=1e-6)
+    assert batch[2].height == 100 and torch.equal(batch[2].rotation, cameras[2].rotation)
+
+def test_pixels_to_rays_skew():
+    pixels = torch.rand(10, 2) * 100
+    rays = pixels_to_rays(pixels, torch.tensor([50., 50.]), torch.tensor([100., 110.]),
+                          skew=0.1, normalize=False)
+    xy = (pixels - 50) / torch.tensor([100., 110.])
+    assert torch.allclose(rays[:, 0], xy[:, 0] - 0.1 * xy[:, 1] / 110)
+
+def test_undistort_map():
+    cam = Camera(center=torch.tensor([320., 240.]), focal=torch.tensor([500., 500.]),
+                 radial=torch.tensor([-0.2, 0.05, -0.01]), tangential=torch.tensor([1e-3, -2e-3]),
+                 width=640, height=480)
+    pixels = torch.rand(100000, 2) * torch.tensor([640., 480.])
+    _start = time.time()
+    expected = cam.rays(pixels)
+    _solver = time.time() - _start
+    umap = UndistortMap(cam.width, cam.height, cam.center, cam.focal, cam.radial,
+                        cam.tangential, step=32, tol=1e-5)
+    _start = time.time()
+    rays = pixels_to_rays(pixels, None, None, rotation=cam.rotation, undistort=umap)
+    _map = time.time() - _start
+    print(f"\nUndistortMap step {umap.step} error {umap.error:.2e}, {len(pixels)} rays solver "
+          f"{_solver*1e3:.1f}ms map {_map*1e3:.1f}ms")
+    assert umap.step < 32 and umap.error <= 1e-5
+    assert (rays - expected).abs().max() <= umap.error
+
+    # cached on camera, rebuilt when intrinsics change
+    assert torch.allclose(cam.rays(pixels, undistort=True), expected, atol=1e-4)
+    assert cam.undistort_map() is cam.undistort_map()
+    _map = cam.undistort_map()
+    cam.radial[0] = -0.1
+    assert cam.undistort_map() is not _map
+
+def test_undistort_map_batched():
+    cameras = Camera.stack(_cameras(8))
+    pixels = torch.rand(8, 500, 2) * 100
+    umap = UndistortMap(cameras.width, cameras.height, cameras.center, cameras.focal,
+                        cameras.radial, cameras.tangential, step=4)
+    assert umap.grid.shape == (8, 26, 26, 2)
+    rays = cameras.rays(pixels, undistort=True, step=4)
+    assert (rays - cameras.rays(pixels)).abs().max() <= umap.error + 1e-6
+
+def test_undistort_early_exit():
+    center, focal = torch.tensor([320., 240.]), torch.tensor([500., 500.])
+    radial, tangential = torch.tensor([-0.2, 0.05, -0.01]), torch.tensor([1e-3, -2e-3])
+    pixels = torch.rand(200000, 2) * torch.tensor([640., 480.])
+    rays, stats = pixels_to_rays(pixels, center, focal, radial, tangential, iters=20,
+                                 normalize=False, stats=True)
+    print(f"\nundistort mean iters {stats.iters.float().mean():.2f} max {stats.iters.max()}, "
+          f"max residual {stats.residual.max():.2e}")
+    assert stats.iters.max() < 20 and stats.residual.max() <= 8 * torch.finfo(torch.float32).eps
+    xy = rays[:, :2]
+    rad = (xy**2).sum(-1, keepdim=True)
+    distorted = (xy * (1 + rad * (radial[0] + rad * (radial[1] + radial[2] * rad))) +
+                 2 * tangential * xy.prod(-1, keepdim=True) + tangential.flip(-1) * (rad + 2 * xy**2))
+    assert torch.allclose(distorted * focal + center, pixels, atol=1e-3)
+
+    # loose tolerance exits earlier, singular jacobians do not produce nans
+    _, loose = pixels_to_rays(pixels, center, focal, radial, tangential, tol=1e-3, stats=True)
+    assert loose.iters.sum() < stats.iters.sum()
+    wild = pixels_to_rays(pixels * 10, center, focal, torch.tensor([-5., 0., 0.]), tangential)
+    assert not torch.isnan(wild).any()
+
+def test_ray_sampler():
+    cameras = _cameras(64)
+    for cam in cameras:
+        cam.height, cam.width = 480, 640
+        cam.center.add_(torch.tensor([270., 190.]))
+        cam.focal.mul_(5)
+    batch = Camera.stack(cameras)
+    num = 2**16
+    for stratified in (True, False):
+        sampler = RaySampler(batch, stratified=stratified)
+        _start = time.time()
+        out = sampler(num)
+        _elapsed = time.time() - _start
+        print(f"\nRaySampler stratified={stratified} {num/_elapsed/1e6:.2f}M rays/s")
+        counts = out.camera.bincount(minlength=len(cameras))
+        assert out.directions.shape == (num, 3) and counts.min() > 0
+        if stratified:
+            assert counts.max() - counts.min() <= 1
+        assert len((out.camera * len(sampler) + out.index).unique()) == num
+        assert torch.equal(out.pixels[:, 0] - 0.5 + (out.pixels[:, 1] - 0.5) * 640,
+                           out.index.float())
+        expected = torch.stack([cameras[c].rays(p) for c, p in
+                                zip(out.camera[:100].tolist(), out.pixels[:100])])
+        assert torch.allclose(out.directions[:100], expected, atol=1e-6)
+        assert torch.equal(out.origins[:100], batch.position[out.camera[:100]])
+
+    # reference: full grid per image, then index
+    _start = time.time()
+    grid = mgrid((480, 640))
+    camera = torch.randint(0, len(cameras), (num,))
+    index = torch.randint(0, 480 * 640, (num,))
+    pixels = grid.expand(len(cameras), 480, 640, 2).reshape(len(cameras), -1, 2)[camera, index]
+    batch[camera].rays(pixels)
+    print(f"full grid indexing {num/(time.time() - _start)/1e6:.2f}M rays/s")
+
+    out = RaySampler(batch, undistort=True, step=4, jitter=True)(num)
+    assert ((out.pixels - out.pixels.floor() - 0.5).abs() > 1e-3).any()
+    expected = batch[out.camera].rays(out.pixels)
+    assert (out.directions - expected).abs().max() < 1e-4
+
+def test_points_to_pixels_roundtrip():
+    cam = _cameras(1)[0]
+    pixels = mgrid((100, 100)).view(-1, 2).float()
+    rays = pixels_to_rays(pixels, cam.center, cam.focal, cam.radial, cam.tangential, iters=20)
+    out = points_to_pixels(rays * 3, cam.center, cam.focal, cam.radial, cam.tangential,
+                           depth=True)
+    assert (out.pixels - pixels).abs().max() < 1e-3 and torch.allclose(out.depth, rays[:, 2] * 3)
+
+def test_points_to_pixels_cull():
+    batch = Camera.stack(_cameras(8))
+    batch.position = torch.randn(8, 3)
+    points = torch.randn(500_000, 3) * 5
+    _args = (points, batch.center, batch.focal, batch.radial, batch.tangential)
+    _kw = {"position": batch.position, "rotation": batch.rotation}
+    _start = time.time()
+    full = points_to_pixels(*_args, **_kw, depth=True)
+    _full = time.time() - _start
+    _start = time.time()
+    out = points_to_pixels(*_args, **_kw, width=100, height=100, cull=True, depth=True)
+    _cull = time.time() - _start
+    print(f"\npoints_to_pixels {len(points)}x8 full {_full*1e3:.1f}ms cull {_cull*1e3:.1f}ms")
+    assert full.pixels.shape == (8, len(points), 2)
+
+    loop = torch.stack([points_to_pixels(points, batch.center[i], batch.focal[i], batch.radial[i],
+                                         batch.tangential[i], position=batch.position[i],
+                                         rotation=batch.rotation[i]) for i in range(8)])
+    valid = (full.depth > 0) & ((full.pixels >= 0) & (full.pixels < 100)).all(-1)
+    assert (loop - full.pixels)[valid].abs().max() < 1e-3
+
+    # culled points are visible in full projection
+    assert (out.depth > 0).all() and ((out.pixels >= 0) & (out.pixels < 100)).all()
+    assert (out.pixels - full.pixels[out.view, out.index]).abs().max() < 1e-2
+    assert torch.allclose(out.depth, full.depth[out.view, out.index], atol=1e-4)
+
+    # visible points within distortion valid region are not culled
+    xy = torch.einsum("vij,vnj->vni", batch.rotation, points[None] - batch.position[:, None])
+    inside = valid & (((xy[..., :2] / xy[..., 2:]) ** 2).sum(-1) < 0.25)
+    kept = torch.zeros_like(inside)
+    kept[out.view, out.index] = True
+    assert (inside & ~kept).sum() <= inside.sum() * 1e-4
+
+def test_points_to_pixels_position_shape():
+    points = torch.rand(100, 3) + torch.tensor([0., 0., 1.])
+    center, focal = torch.tensor([50., 50.]), torch.tensor([100., 100.])
+    position = torch.rand(1, 3) * 0.1 # documented single camera shape
+    pixels = points_to_pixels(points, center, focal, position=position, rotation=torch.eye(3))
+    assert pixels.shape == (100, 2)
+    assert torch.allclose(pixels, points_to_pixels(points, center, focal, position=position[0]))
+    out = points_to_pixels(points, center, focal, position=position, rotation=torch.eye(3),
+                           width=100, height=100, cull=True)
+    assert "view" not in out and torch.allclose(out.pixels, pixels[out.index])
+
+    # (1,3) position broadcast to batched rotations
+    rotation = torch.eye(3).expand(4, 3, 3)
+    batch = points_to_pixels(points, center, focal, position=position, rotation=rotation)
+    assert batch.shape == (4, 100, 2) and torch.allclose(batch, pixels.expand(4, 100, 2))
+    out = points_to_pixels(points, center, focal, position=position, rotation=rotation,
+                           width=100, height=100, cull=True)
+    assert torch.allclose(out.pixels, batch[out.view, out.index])
+
+def test_ray_sampler_index():
+    # flat indices above 2^24 are not exact in float32
+    cameras = [Camera(center=torch.tensor([3000., 2000.]), focal=torch.tensor([5000., 5000.]),
+                      height=4000, width=6000) for _ in range(2)]
+    for stratified in (True, False):
+        out = RaySampler(Camera.stack(cameras), stratified=stratified)(20000)
+        assert torch.equal((out.pixels[:, 1] - 0.5).long() * 6000 + (out.pixels[:, 0] - 0.5).long(),
+                           out.index)
+
+    # every pixel of a small camera
+    small = Camera(center=torch.tensor([2., 2.]), focal=torch.tensor([4., 4.]), height=4, width=4)
+    out = RaySampler(small)(16)
+    assert torch.equal(out.index, torch.arange(16))
+    assert torch.equal(out.pixels, mgrid((4, 4)).view(-1, 2))
@@ -0,0 +1,334 @@
+import os
+import os.path as osp
+import time
+import shutil
+import hashlib
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from koreto.fileio import get_files, scan_files, iter_files, get_images, iter_images, image_info, \
+    verify_image, hash_file, hash_folder, load_hashes, get_hasher, find_duplicates, HashIndex, \
+    get_keys_with_subkeyval, ListingCache, IMAGE_EXT, get_last
+
+
+def _make_files(folder, number=64, size=2**18):
+    for i in range(number):
+        with open(osp.join(folder, f"{i:04d}.bin"), "wb") as _fi:
+            _fi.write(os.urandom(size + i))
+    return sorted(f.path for f in os.scandir(folder))
+
+def test_hash_file_chunked(tmp_path):
+    name = _make_files(tmp_path, 1, 2**20 + 7)[0]
+    with open(name, "rb") as _fi:
+        expected = hashlib.md5(_fi.read()).hexdigest()
+    assert hash_file(name, chunk_size=4096)["content"] == expected
+    assert hash_file(name)["content"] == expected
+
+def test_hash_folder_workers(tmp_path):
+    files = _make_files(tmp_path)
+    mbytes = sum(os.stat(f).st_size for f in files) / 2**20
+    _start = time.time()
+    serial = hash_folder(str(tmp_path))
+    _serial = time.time() - _start
+    _start = time.time()
+    threaded = hash_folder(files, metadata=list(range(len(files))), workers=4, verbose=True)
+    _threaded = time.time() - _start
+    print(f"hash_folder {len(files)} files serial {len(files)/_serial:.1f} files/s "
+          f"{mbytes/_serial:.1f} MB/s, 4 threads {len(files)/_threaded:.1f} files/s "
+          f"{mbytes/_threaded:.1f} MB/s")
+    assert list(threaded) == files
+    assert all(threaded[f]["content"] == serial[f]["content"] for f in files)
+    assert [threaded[f]["metadata"] for f in files] == list(range(len(files)))
+
+    processed = hash_folder(files, workers=2, processes=True)
+    assert all(processed[f]["content"] == serial[f]["content"] for f in files)
+
+def test_hash_folder_incremental(tmp_path):
+    folder = osp.join(tmp_path, "data")
+    os.makedirs(folder)
+    files = _make_files(folder, 16, 2**16)
+    save = osp.join(tmp_path, "hashes.pt")
+    first = hash_folder(folder, save=save)
+
+    with open(files[3], "ab") as _fi:
+        _fi.write(b"modified")
+    os.utime(files[3], (0, 12345))
+    os.remove(files[5])
+    for name in files[6:]: # unchanged datesize, stale content proves it was not reread
+        first[name]["content"] = "cached"
+    with open(osp.join(folder, "new.bin"), "wb") as _fi:
+        _fi.write(b"new")
+    _start = time.time()
+    second = hash_folder(folder, previous=first)
+    print(f"\nhash_folder incremental {(time.time() - _start)*1e3:.1f}ms")
+
+    assert files[5] not in second and osp.join(folder, "new.bin") in second
+    assert second[files[3]]["content"] != first[files[3]]["content"]
+    assert all(second[f]["content"] == "cached" for f in files[6:])
+    assert second[files[0]]["content"] == first[files[0]]["content"]
+
+    assert hash_folder(folder, previous=save)[files[6]] == load_hashes(save)[files[6]]
+
+def test_hash_algorithms(tmp_path):
+    files = _make_files(tmp_path, 8, 2**21)
+    mbytes = sum(os.stat(f).st_size for f in files) / 2**20
+    algorithms = ["md5", "sha1", "sha256", "blake2b", "blake2b-16", "blake2s-8"]
+    try:
+        import xxhash # pylint: disable=unused-import
+        algorithms += ["xxh64", "xxh3_64"]
+    except ImportError:
+        pass
+    print(f"\n{'algorithm':<12} {'sample':>7} {'MB/s':>9}")
+    for algorithm in algorithms:
+        for sample in (0, 2**16):
+            _start = time.time()
+            out = hash_folder(files, algorithm=algorithm, sample=sample)
+            _elapsed = max(time.time() - _start, 1e-9)
+            print(f"{algorithm:<12} {sample:>7} {mbytes/_elapsed:>9.1f}")
+            assert len(out[files[0]]["content"]) == len(get_hasher(algorithm).hexdigest())
+
+    with open(files[0], "rb") as _fi:
+        expected = hashlib.blake2b(_fi.read(), digest_size=16).hexdigest()
+    assert hash_file(files[0], algorithm="blake2b-16")["content"] == expected
+    assert "algorithm" not in hash_file(files[0]) and "sample" not in hash_file(files[0])
+    full = hash_file(files[0], sample=2**16)
+    assert full["content"] != hash_file(files[0])["content"]
+    # previous entry hashed with other algorithm is not reused
+    assert hash_file(files[0], previous=full)["content"] == hash_file(files[0])["content"]
+
+def test_find_duplicates(tmp_path):
+    files = _make_files(tmp_path, 12, 2**18)
+    shutil.copy(files[0], osp.join(tmp_path, "copy0.bin"))
+    shutil.copy(files[0], osp.join(tmp_path, "copy1.bin"))
+    shutil.copy(files[1], osp.join(tmp_path, "copy2.bin"))
+    # same size, head and tail as files[2], different middle
+    with open(files[2], "rb") as _fi:
+        data = bytearray(_fi.read())
+    data[len(data)//2] ^= 1
+    with open(osp.join(tmp_path, "near2.bin"), "wb") as _fi:
+        _fi.write(data)
+    for i in range(2): # small files, fully hashed in sample stage
+        with open(osp.join(tmp_path, f"small{i}.txt"), "w") as _fi:
+            _fi.write("same")
+
+    _start = time.time()
+    dupes = find_duplicates(str(tmp_path), sample=2**12, verbose=True)
+    print(f"find_duplicates {(time.time() - _start)*1e3:.1f}ms")
+    expected = [[files[1], osp.join(tmp_path, "copy2.bin")],
+                [files[0], osp.join(tmp_path, "copy0.bin"), osp.join(tmp_path, "copy1.bin")],
+                [osp.join(tmp_path, f"small{i}.txt") for i in range(2)]]
+    assert sorted(map(sorted, dupes)) == sorted(map(sorted, expected))
+    assert dupes[-1] == sorted(expected[-1]), "largest files first"
+    assert sorted(map(sorted, find_duplicates(str(tmp_path), sample=0, workers=2))) == \
+        sorted(map(sorted, expected))
+
+def test_hash_index(tmp_path):
+    files = _make_files(tmp_path, 6, 2**10)
+    shutil.copy(files[0], osp.join(tmp_path, "copy0.bin"))
+    hashes = hash_folder(str(tmp_path), metadata=[[i % 2] for i in range(7)])
+    index = HashIndex(hashes)
+    assert len(index) == 7 and files[0] in index
+
+    content = hashes[files[0]]["content"]
+    assert index.get("content", content) == get_keys_with_subkeyval(hashes, "content", content)
+    assert index.keys("metadata", [1]) == [f for f in hashes if hashes[f]["metadata"] == [1]]
+    assert [sorted(group) for group in index.groups("content").values()] == \
+        [[files[0], osp.join(tmp_path, "copy0.bin")]]
+    assert len(index.values("folder")) == 1
+
+    index.remove(osp.join(tmp_path, "copy0.bin"))
+    assert not index.groups("content") and index.keys("content", content) == [files[0]]
+    index.add("extra", dict(hashes[files[0]], metadata=np.ones(2)))
+    assert sorted(index.keys("content", content)) == [files[0], "extra"]
+    assert index.keys("metadata", np.ones(2)) == ["extra"]
+
+    # tensors hash by identity, index by content
+    index = HashIndex({"a": {"m": torch.tensor([1, 2])}, "b": {"m": torch.tensor([1, 2])},
+                       "c": {"m": (torch.tensor([3]),)}})
+    assert index.keys("m", torch.tensor([1, 2])) == ["a", "b"]
+    assert list(index.groups("m").values()) == [["a", "b"]]
+    assert index.keys("m", (torch.tensor([3]),)) == ["c"]
+
+    queries = [hashes[f]["datesize"] for f in hashes] * 200
+    _start = time.time()
+    for query in queries:
+        index.get("datesize", query)
+    print(f"\nHashIndex {len(queries)} queries {(time.time() - _start)*1e3:.1f}ms")
+
+def _make_tree(folder, depth=3, width=3, files=20):
+    for i in range(width):
+        sub = osp.join(folder, f"d{i}")
+        os.makedirs(sub)
+        for j in range(files):
+            with open(osp.join(sub, f"{j:03d}{'.png' if j % 2 else '.txt'}"), "wb") as _fi:
+                _fi.write(b"x" * (j + 1))
+        if depth > 1:
+            _make_tree(sub, depth - 1, width, files)
+
+def _get_files_walk(folder, ext=None, sortkey=None):
+    """ os.walk reference"""
+    out = [osp.join(root, name) for root, _, files in os.walk(folder) for name in files
+           if ext is None or osp.splitext(name)[-1].lower() in ext]
+    return sorted(out, **({} if sortkey is None else {'key':osp.__dict__[f'get{sortkey}']}))
+
+def test_get_files_scandir(tmp_path):
+    _make_tree(str(tmp_path))
+    expected = _get_files_walk(str(tmp_path))
+    assert len(expected) == (3 + 9 + 27) * 20
+    assert get_files(str(tmp_path), recursive=True) == expected
+    assert get_files(str(tmp_path), recursive=True, workers=4) == expected
+    assert get_files(str(tmp_path), ext=".png", recursive=True) == \
+        _get_files_walk(str(tmp_path), [".png"])
+    assert not get_files(str(tmp_path))
+    assert len(get_files(osp.join(tmp_path, "d0"), filter_text="001")) == 1
+
+    for workers in (0, 4):
+        _start = time.time()
+        out = get_files(str(tmp_path), recursive=True, sortkey="size", workers=workers)
+        print(f"\nget_files sortkey='size' workers={workers} {(time.time() - _start)*1e3:.1f}ms")
+        assert [os.stat(f).st_size for f in out] == sorted(os.stat(f).st_size for f in expected)
+    _start = time.time()
+    _get_files_walk(str(tmp_path), sortkey="size")
+    print(f"os.walk + getsize {(time.time() - _start)*1e3:.1f}ms")
+
+    entries = scan_files(str(tmp_path), recursive=True, workers=2)
+    assert isinstance(next(entries), os.DirEntry)
+    assert sum(1 for _ in entries) == len(expected) - 1
+
+    # missing root folders raise
+    missing = osp.join(tmp_path, "typo")
+    for kwargs in ({}, {"recursive": True}, {"recursive": True, "workers": 2},
+                   {"cache": osp.join(tmp_path, "cache")}):
+        with pytest.raises(FileNotFoundError):
+            get_files(missing, **kwargs)
+
+def test_iter_files(tmp_path):
+    _make_tree(str(tmp_path), depth=2)
+    expected = get_files(str(tmp_path), recursive=True)
+    assert sorted(iter_files(str(tmp_path), recursive=True, workers=2)) == expected
+    assert list(iter_files(str(tmp_path), recursive=True, buffer=len(expected))) == expected
+    by_size = list(iter_files(str(tmp_path), recursive=True, sortkey="size", buffer=10**6))
+    assert by_size == get_files(str(tmp_path), recursive=True, sortkey="size")
+
+    # bounded buffer: same items, fewer out of order than discovery order
+    out = list(iter_files(str(tmp_path), recursive=True, buffer=16))
+    unsorted = list(iter_files(str(tmp_path), recursive=True))
+    descents = lambda items: sum(a > b for a, b in zip(items, items[1:]))
+    assert sorted(out) == expected and descents(out) <= descents(unsorted)
+
+    _start = time.time()
+    first = next(iter_files(str(tmp_path), recursive=True))
+    print(f"\niter_files first item {(time.time() - _start)*1e3:.2f}ms")
+    assert first in expected
+
+def test_iter_images(tmp_path):
+    for i in range(6):
+        Image.new("RGB", (8 + i, 4)).save(osp.join(tmp_path, f"{i}.png"))
+    with open(osp.join(tmp_path, "fake.jpg"), "w") as _fi:
+        _fi.write("not an image")
+    expected = get_images(str(tmp_path), verbose=False)
+    assert len(expected) == 6
+    assert list(iter_images(str(tmp_path), buffer=100)) == expected
+    assert sorted(iter_images(str(tmp_path), workers=3)) == expected
+    assert len(list(iter_images(str(tmp_path), verify=False))) == 7
+
+def test_image_info(tmp_path):
+    formats = {".png": ["1", "L", "I;16", "RGB", "RGBA", "P", "LA"], ".jpg": ["L", "RGB", "CMYK"],
+               ".ppm": ["1", "L", "RGB"], ".pgm": ["L"], ".bmp": ["1", "L", "P", "RGB"],
+               ".tif": ["1", "L", "RGB", "RGBA", "I;16", "CMYK"], ".webp": ["RGB", "RGBA"]}
+    data = np.random.default_rng(0).integers(0, 255, (17, 23, 3), dtype=np.uint8)
+    files = []
+    for ext, modes in formats.items():
+        for mode in modes:
+            files.append(osp.join(tmp_path, f"{mode.replace(';', '')}{ext}"))
+            Image.fromarray(data).convert(mode).save(files[-1])
+    files.append(osp.join(tmp_path, "exif.jpg"))
+    Image.fromarray(data).save(files[-1], exif=b"Exif\x00\x00" + b"x" * 60000)
+    files.append(osp.join(tmp_path, "lossless.webp"))
+    Image.fromarray(data).save(files[-1], lossless=True)
+    with open(osp.join(tmp_path, "fake.png"), "wb") as _fi:
+        _fi.write(b"\x89PNG not really")
+
+    for name in files:
+        with Image.open(name) as image:
+            assert image_info(name) == (image.format, image.size, image.mode), name
+    assert image_info(osp.join(tmp_path, "fake.png")) is None
+
+    out = get_images(str(tmp_path), verbose=False, info=True, workers=2)
+    assert sorted(out) == sorted(files) and out[files[0]].size == (23, 17)
+
+    files = files * 20
+    _start = time.time()
+    header = [verify_image(name) for name in files]
+    _header = time.time() - _start
+    _start = time.time()
+    pil = [verify_image(name, header=False) for name in files]
+    _pil = time.time() - _start
+    print(f"\nverify_image {len(files)} files header {_header*1e3:.1f}ms PIL {_pil*1e3:.1f}ms")
+    assert all(header) and all(pil)
+
+def test_listing_cache(tmp_path):
+    data, cache = osp.join(tmp_path, "data"), osp.join(tmp_path, "cache")
+    _make_tree(data)
+    for i in range(4):
+        Image.new("L", (4 + i, 3)).save(osp.join(data, "d1", f"img{i}.png"))
+
+    expected = get_files(data, recursive=True, sortkey="size")
+    _start = time.time()
+    assert get_files(data, recursive=True, sortkey="size", cache=cache) == expected
+    _first = time.time() - _start
+    _start = time.time()
+    assert get_files(data, recursive=True, sortkey="size", cache=cache, workers=2) == expected
+    print(f"\nget_files cache first {_first*1e3:.1f}ms cached {(time.time() - _start)*1e3:.1f}ms")
+    assert len(os.listdir(cache)) == 1
+
+    # only modified directory is rescanned
+    listing = ListingCache(data, None, True, cache)
+    modified, unmodified = listing.dirs[osp.join(data, "d0")], listing.dirs[osp.join(data, "d1")]
+    os.remove(osp.join(data, "d0", "000.txt"))
+    Image.new("L", (9, 9)).save(osp.join(data, "d0", "new.png"))
+    listing.scan()
+    assert listing.dirs[osp.join(data, "d0")] is not modified
+    assert listing.dirs[osp.join(data, "d1")] is unmodified
+    assert get_files(data, recursive=True, cache=cache) == get_files(data, recursive=True)
+
+    # images and verification results
+    with open(osp.join(data, "d2", "fake.png"), "w") as _fi:
+        _fi.write("not an image")
+    expected = get_images(data, recursive=True, info=True, verbose=False)
+    assert len(expected) == 5
+    assert get_images(data, recursive=True, info=True, verbose=False, cache=cache) == expected
+    listing = ListingCache(data, IMAGE_EXT, True, cache)
+    assert "fake.png" in listing.dirs[osp.join(data, "d2")]["info"]
+    assert listing.dirs[osp.join(data, "d0")]["info"]["new.png"] == ("PNG", (9, 9), "L")
+    assert get_images(data, recursive=True, verbose=False, cache=cache) == list(expected)
+
+def _get_last_sorted(number=1, folder='.'):
+    """ previous get_last(): stat per file and full sort"""
+    files = [f.path for f in os.scandir(folder) if f.is_file()]
+    return sorted(files, key=os.path.getmtime, reverse=True)[:number]
+
+def test_get_last(tmp_path):
+    files = _make_files(tmp_path, 2000, 1)
+    for i, name in enumerate(files):
+        os.utime(name, (i, (i * 7919) % len(files)))
+    os.makedirs(osp.join(tmp_path, "sub"))
+    newest = osp.join(tmp_path, "sub", "newest.txt")
+    with open(newest, "w") as _fi:
+        _fi.write("new")
+
+    for number in (1, 10, None):
+        _start = time.time()
+        out = get_last(number, str(tmp_path))
+        _heap = time.time() - _start
+        _start = time.time()
+        expected = _get_last_sorted(number, str(tmp_path))
+        _sorted = time.time() - _start
+        print(f"\nget_last({number}) {len(files)} files heap {_heap*1e3:.2f}ms "
+              f"sorted {_sorted*1e3:.2f}ms")
+        assert out == expected
+
+    assert get_last(1, str(tmp_path), recursive=True) == [newest]
+    assert get_last(1, str(tmp_path), also_folders=True) == [osp.join(tmp_path, "sub")]
+    assert get_last(2, str(tmp_path), ext=".TXT", recursive=True) == [newest]
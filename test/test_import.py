@@ -0,0 +1,46 @@
+import sys
+import subprocess
+import time
+
+
+def _run(code):
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                          check=True).stdout.split()
+
+def test_lazy_import():
+    """ `import koreto; koreto.ObjDict` should not load heavy dependencies"""
+    heavy = ("torch", "matplotlib", "plotly", "pandas", "scipy")
+    code = ("import sys, koreto; koreto.ObjDict; "
+            f"print(*[m for m in {heavy} if m in sys.modules])")
+    _start = time.time()
+    loaded = _run(code)
+    print(f"\nimport koreto; koreto.ObjDict: {time.time() - _start:.3f}s")
+    assert not loaded, f"import koreto loaded {loaded}"
+
+def test_lazy_attributes():
+    import koreto
+    for name in koreto.__all__:
+        assert getattr(koreto, name) is not None, f"could not load koreto.{name}"
+    assert set(koreto.__all__) <= set(dir(koreto))
+
+def test_lazy_submodules():
+    """ `import koreto; koreto.fileio` imports submodule on access"""
+    code = "import sys, koreto; print('koreto.log' in sys.modules, koreto.log.__name__)"
+    assert _run(code) == ["False", "koreto.log"]
+    import koreto
+    for name in ("utils", "fileio", "log", "info", "points", "transformations", "bounds"):
+        assert getattr(koreto, name).__name__ == f"koreto.{name}"
+    if koreto.WITH_TORCH:
+        assert koreto.camera.Camera is koreto.Camera and koreto.tensor_utils is not None
+
+def test_with_torch_import_fails(tmp_path):
+    """ WITH_TORCH is False if torch is installed but fails to import"""
+    (tmp_path / "torch").mkdir()
+    (tmp_path / "torch" / "__init__.py").write_text("raise ImportError('broken torch')\n")
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); import koreto; "
+            "print(koreto.WITH_TORCH, hasattr(koreto, 'Camera'), koreto.ObjDict.__name__, "
+            "koreto.mgrid.__name__)")
+    out = subprocess.run([sys.executable, "-c", code, str(tmp_path)], capture_output=True,
+                         text=True, check=True).stdout.split()
+    assert out == ["False", "False", "ObjDict", "mgrid"]
+    assert _run("import koreto; print(koreto.WITH_TORCH)") == ["True"]
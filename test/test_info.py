@@ -1,5 +1,9 @@
+import time
+import math
+import pytest
 import torch
-from koreto.info import tensor_flat2
+from koreto.info import tensor_flat2, entropy, _entropy, _batch_entropy, covariance, eigen_vals, pca
+from koreto.info import EntropyAccumulator, CovarianceAccumulator, PCAAccumulator
 
 def test_tensor_flat2():
     x = torch.zeros(2,3,4,5)
@@ -13,3 +17,81 @@ def test_tensor_flat2():
     assert tensor_flat2(x, 1, 1).shape == (3, 2*4*5), f"{tensor_flat2(x, 1, 1).shape }== (3, 2*4*5)"
     assert tensor_flat2(x, 2, 1).shape == (4, 2*4*5), f"{tensor_flat2(x, 1, 2).shape} == (4, 2*4*5)"
     assert tensor_flat2(x, 2, 4).shape == tensor_flat2(x, 1, 4).shape == (2*3*4*5,1), f"{tensor_flat2(x, 1, 4).shape} == (2*3*4*5,1)"
+
+def test_batch_entropy():
+    x = torch.randn(4000, 256)
+    _start = time.time()
+    loop = torch.stack([_entropy(_t, low=0, high=0) for _t in x])
+    _loop = time.time() - _start
+    _start = time.time()
+    batch = _batch_entropy(x, low=0, high=0)
+    _batch = time.time() - _start
+    print(f"\nentropy of {tuple(x.shape)}: loop {_loop*1e3:.1f}ms, batched {_batch*1e3:.1f}ms")
+    assert torch.allclose(loop, batch, atol=1e-5)
+
+    x = torch.randint(0, 9, (2, 3, 8, 8))
+    h, hs = entropy(x, num_fixed_axes=2, low=1, high=6, base=None)
+    assert torch.allclose(hs, torch.stack([_entropy(_t.double(), 1, 6, None)
+                                           for _t in tensor_flat2(x, num=2)]))
+
+def test_entropy_bins_chunk():
+    x = torch.randn(4, 3, 32, 32)
+    for bins in (None, 100, 'sqrt', 'fd'):
+        h, hs = entropy(x, num_fixed_axes=1, bins=bins)
+        _h, _hs = entropy(x, num_fixed_axes=1, bins=bins, chunk=1000)
+        assert torch.allclose(h, _h) and torch.allclose(hs, _hs), f"bins={bins}"
+        assert torch.allclose(hs, torch.stack([_entropy(_t, 0, 0, bins=bins)
+                                               for _t in x.view(4, -1)]), atol=1e-5)
+    assert entropy(x, bins=16, base=None) <= 1.
+
+def test_accumulators():
+    x = torch.randn(600, 4, 5) * torch.linspace(0.1, 3, 20).view(4, 5)
+    fixed = EntropyAccumulator(256, -4, 4)
+    grown = EntropyAccumulator(256)
+    cov = CovarianceAccumulator()
+    _pca = PCAAccumulator()
+    for batch in x.split(100):
+        for acc in (fixed, grown, cov, _pca):
+            acc.update(batch)
+    assert torch.allclose(fixed.compute().float(), _entropy(x, -4, 4, bins=256))
+    assert torch.allclose(grown.compute().float(), _entropy(x, grown.low, grown.high, bins=256),
+                          atol=1e-2)
+
+    flat = x.view(len(x), -1).double()
+    assert torch.allclose(cov.compute(), covariance(flat, flat))
+    assert torch.allclose(cov.eigen_vals(), eigen_vals(flat))
+    assert torch.allclose(_pca.compute(3).abs(), pca(x.double(), 3).abs())
+
+def test_entropy_chunk_default_bins():
+    x = torch.randn(3_000_000)
+    _start = time.time()
+    h = entropy(x)
+    _full = time.time() - _start
+    _start = time.time()
+    _h = entropy(x, chunk=2**18)
+    print(f"\nentropy {tuple(x.shape)} bins=None {_full*1e3:.1f}ms chunk=2**18 "
+          f"{(time.time() - _start)*1e3:.1f}ms")
+    assert torch.allclose(h, _h)
+    p = torch.histc(x, len(x), x.min().item(), x.max().item()).double() / len(x)
+    assert torch.allclose(h, torch.special.entr(p).sum().div(math.log(2)).float())
+
+def test_entropy_fd_sparse():
+    # more than 75% zeros: interquartile range is 0
+    x = torch.relu(torch.randn(8, 10000) - 1)
+    h = entropy(x, bins='fd')
+    assert h > 0 and torch.allclose(h, entropy(x, bins='sqrt'))
+    _, hs = entropy(x, num_fixed_axes=1, bins='fd')
+    assert (hs > 0).all() and torch.allclose(hs, entropy(x, num_fixed_axes=1, bins='sqrt')[1])
+
+def test_entropy_accumulator_non_finite():
+    acc = EntropyAccumulator(256)
+    acc.update(torch.randn(100))
+    for value in (float("inf"), float("nan")):
+        x = torch.randn(100)
+        x[3] = value
+        with pytest.raises(ValueError):
+            acc.update(x)
+    assert acc.num == 100
+    fixed = EntropyAccumulator(256, -4, 4)
+    fixed.update(torch.tensor([float("inf"), 0., 1.]))
+    assert torch.isfinite(fixed.compute())
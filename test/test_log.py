@@ -0,0 +1,106 @@
+import os.path as osp
+import numpy as np
+import pandas as pd
+from koreto.log import PLog, NpyLog, LogTail, EWM, read_log, log_segments
+
+
+def test_plog_buffered(tmp_path):
+    name = osp.join(tmp_path, "train.csv")
+    log = PLog(name, buffer=4, flush_secs=1e3)
+    for i in range(6):
+        log.write(Epoch=0, Iter=i, Loss=1/(i+1), printlog=False)
+    assert len(read_log(name)) == 4, "expected 4 rows flushed, 2 buffered"
+
+    log.write(Epoch=1, Iter=6, Loss=0.1, Acc=0.5, printlog=False) # new column -> new segment
+    log.close()
+    assert log_segments(name) == [name, osp.join(tmp_path, "train.1.csv")]
+
+    data = PLog(name, init=False).data
+    assert list(data.columns) == ["Epoch", "Iter", "Loss", "Acc"]
+    assert np.allclose(data.Iter, np.arange(7))
+    assert data.Acc.isna().sum() == 6 and data.Acc.iloc[-1] == 0.5
+
+def test_plog_unbuffered(tmp_path):
+    name = osp.join(tmp_path, "train.csv")
+    log = PLog(name)
+    log.write(Iter=0, Loss=1., printlog=False)
+    log.write(Iter=1, Loss=0.5, Acc=2, printlog=False)
+    assert log_segments(name) == [name]
+    data = read_log(name)
+    assert list(data.columns) == ["Iter", "Loss", "Acc"] and len(data) == 2
+
+def test_plog_npy(tmp_path):
+    name = osp.join(tmp_path, "train.csv")
+    log = PLog(name, backend="npy", buffer=3)
+    for i in range(5):
+        log.write(Epoch=i//2, Iter=i, Loss=1/(i+1), printlog=False)
+    log.write(Epoch=2, Iter=5, Loss=0.1, Acc=0.5, printlog=False)
+    log.write(Iter=6, Loss=0.05, printlog=False) # missing int column Epoch -> float64
+    log.close()
+
+    store = NpyLog(osp.join(tmp_path, "train.npylog"))
+    assert store.len == 7
+    assert isinstance(store.column("Loss"), np.memmap)
+    assert store.columns["Iter"]["dtype"] == "int64"
+    assert store.columns["Epoch"]["dtype"] == "float64" and np.isnan(store.column("Epoch")[-1])
+
+    data = read_log(store.folder, columns=["Loss", "Acc"])
+    assert list(data.columns) == ["Loss", "Acc"]
+    assert data.Acc.isna().sum() == 6 and np.allclose(data.Loss[:5], 1/np.arange(1, 6))
+    assert PLog(name, backend="npy", init=False).len == 7
+
+def test_ewm():
+    values = np.random.randn(1000)
+    values[[3, 400, 401]] = np.nan
+    ema = EWM(50)
+    out = np.concatenate([ema.update(values[:10]), ema.update(values[10:700]),
+                          ema.update(values[700:])])
+    expected = pd.Series(values).ewm(span=50).mean().to_numpy()
+    assert np.allclose(out, expected) and np.allclose(ema.values, expected)
+
+def test_logtail(tmp_path):
+    name = osp.join(tmp_path, "train.csv")
+    log = PLog(name, buffer=10)
+    tail = LogTail(name)
+    for i in range(25):
+        log.write(Iter=i, Loss=1/(i+1), printlog=False)
+    assert len(tail.read()) == 20
+    with open(name, 'a', encoding='utf8') as _fi:
+        _fi.write("20,0.04") # incomplete line is not read
+    assert len(tail.read()) == 0
+    with open(name, 'a', encoding='utf8') as _fi:
+        _fi.write("7\n")
+    assert len(tail.read()) == 1
+
+    log.write(Iter=25, Loss=0.01, Acc=0.9, printlog=False) # new segment
+    log.close()
+    new = tail.read()
+    assert list(new.columns) == ["Iter", "Loss", "Acc"] and len(new) == 6
+    assert tail.len == 27 and np.isnan(tail["Acc"][0]) and tail["Acc"][-1] == 0.9
+    assert np.allclose(tail["Loss"], read_log(name).Loss)
+
+    log = PLog(name, backend="npy")
+    tail = LogTail(log._store.folder, columns=["Loss"])
+    log.write(Iter=0, Loss=1., printlog=False)
+    assert len(tail.read()) == 1
+    log.write(Iter=1, Loss=0.5, printlog=False)
+    assert tail.read().Loss.tolist() == [0.5] and tail.keys() == ["Loss"]
+
+def test_logtail_rewrite(tmp_path):
+    import matplotlib
+    matplotlib.use("Agg")
+    name = osp.join(tmp_path, "train.csv")
+    log = PLog(name) # unbuffered: new keys rewrite the csv with a wider header
+    tail = LogTail(name)
+    for i in range(5):
+        log.write(Iter=i, Loss=1/(i+1), printlog=False)
+    log.plot("Loss", read=True, show=False)
+    assert len(tail.read()) == 5
+    log.write(Iter=5, Loss=0.1, Acc=0.5, printlog=False)
+    new = tail.read()
+    assert new.Iter.tolist() == [5] and new.Acc.tolist() == [0.5]
+    assert tail.len == 6 and np.isnan(tail["Acc"][:5]).all()
+    log.plot("Loss", "Acc", read=True, show=False)
+    assert log._tail.len == 6 and np.allclose(log._tail["Iter"], np.arange(6))
+    log.write(Iter=6, Loss=0.05, Acc=0.6, printlog=False)
+    assert tail.read().Iter.tolist() == [6] and np.allclose(tail["Loss"], read_log(name).Loss)
@@ -0,0 +1,42 @@
+import time
+import torch
+from koreto.points import VoxelGrid
+from koreto.transformations import knn
+
+
+def test_voxel_grid_knn():
+    points = torch.rand(20000, 3) * 10
+    points[:20] += 40 # outliers
+    _start = time.time()
+    dists, idcs = VoxelGrid(points).knn(points, k=8)
+    _grid = time.time() - _start
+    _start = time.time()
+    _dists, _idcs = knn(points, k=8)
+    print(f"\nknn {tuple(points.shape)}: grid {_grid:.2f}s, tiled {time.time() - _start:.2f}s")
+    assert torch.allclose(dists, _dists, rtol=1e-3, atol=1e-4)
+    assert (idcs == _idcs).float().mean() > 0.999
+
+def test_voxel_grid_radius():
+    torch.manual_seed(0)
+    points = torch.rand(5000, 2)
+    query = torch.rand(300, 2)
+    idcs, dists = VoxelGrid(points, cell_size=0.03).radius(query, 0.05, chunk=64)
+    expected = (((query[:, None] - points)**2).sum(-1) <= 0.05**2).nonzero()
+    assert len(idcs) == len(expected)
+    assert set(map(tuple, idcs.tolist())) == set(map(tuple, expected.tolist()))
+    assert (dists <= 0.05**2).all()
+
+def test_voxel_grid_knn_outliers():
+    points = torch.rand(20000, 3)
+    points[0] = 100 # isolated outlier
+    dists, idcs = VoxelGrid(points).knn(points, k=8)
+    _dists, _idcs = knn(points, k=8)
+    assert torch.allclose(dists, _dists, rtol=1e-3, atol=1e-4)
+    assert (idcs == _idcs).float().mean() > 0.999
+
+    # queries outside reference bounds
+    query = torch.tensor([[5., 5., 5.], [-3., .5, .5], [.5, .5, .5]])
+    dists, idcs = knn(query, points[1:], k=4, grid=True)
+    _dists, _idcs = knn(query, points[1:], k=4)
+    assert torch.isfinite(dists).all() and (idcs >= 0).all()
+    assert torch.allclose(dists, _dists, rtol=1e-3, atol=1e-4) and torch.equal(idcs, _idcs)
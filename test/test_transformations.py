@@ -0,0 +1,56 @@
+import time
+import numpy as np
+import torch
+from koreto.transformations import knn, mean_dist, estimate_points_normals, fit_plane_normal
+
+
+def test_knn():
+    points = torch.rand(3000, 3) * 100 + 1e4
+    query = torch.rand(500, 3) * 100 + 1e4
+    dists, idcs = knn(query, points, k=8, query_size=128, ref_size=700)
+    _dists, _idcs = torch.cdist(query.double(), points.double()).topk(8, largest=False)
+    assert (idcs == _idcs).float().mean() > 0.999
+    assert torch.allclose(dists.double(), _dists**2, rtol=1e-3, atol=1e-2)
+
+def test_mean_dist():
+    points = torch.randn(2000, 3)
+    _start = time.time()
+    out = mean_dist(points, size=256, k=3)
+    print(f"\nmean_dist {tuple(points.shape)} tiled {(time.time() - _start)*1e3:.1f}ms")
+    expected = ((points[:, None] - points)**2).sum(-1).sort(-1)[0][:, 1:4].mean(-1)
+    assert torch.allclose(out, expected, atol=1e-5)
+
+def test_estimate_points_normals():
+    points = torch.rand(1000, 3)
+    points[:, 2] = 0.5
+    normals = estimate_points_normals(points, k=8, size=100)
+    assert torch.allclose(normals[:, 2].abs(), torch.ones(len(points)), atol=1e-4)
+
+def test_fit_plane_normal_eig():
+    torch.manual_seed(0)
+    points = torch.randn(20000, 10, 3) * torch.tensor([1., 0.5, 0.01])
+    points = points @ torch.linalg.qr(torch.randn(len(points), 3, 3))[0]
+    _start = time.time()
+    svd = fit_plane_normal(points)
+    _svd = time.time() - _start
+    _start = time.time()
+    eig = fit_plane_normal(points, method="eig")
+    _eig = time.time() - _start
+    print(f"\nfit_plane_normal {tuple(points.shape)} svd {_svd*1e3:.1f}ms eig {_eig*1e3:.1f}ms")
+    assert torch.allclose((svd * eig).sum(-1).abs(), torch.ones(len(points)), atol=1e-4)
+    _np = fit_plane_normal(points[:100].numpy(), method="eig")
+    assert np.allclose(np.abs((_np * svd[:100].numpy()).sum(-1)), 1, atol=1e-4)
+
+def test_fit_plane_normal_eig_degenerate():
+    # collinear neighbourhoods, repeated smallest eigen value: any normal to the line
+    line = torch.linspace(0, 10, 500)
+    points = torch.cat([torch.stack((line, torch.full_like(line, i), torch.zeros_like(line)), -1)
+                        for i in range(4)])
+    points = points @ torch.linalg.qr(torch.randn(3, 3))[0]
+    direction = points[1] - points[0]
+    for method in ("eig", "svd"):
+        normals = estimate_points_normals(points, k=8, method=method)
+        assert torch.allclose(normals.norm(dim=-1), torch.ones(len(points)), atol=1e-4)
+        assert (normals @ direction / direction.norm()).abs().max() < 1e-3
+    _np = fit_plane_normal(np.stack([np.ones((10, 3)), np.zeros((10, 3))], 1), method="eig")
+    assert np.allclose(np.linalg.norm(_np, axis=-1), 1)